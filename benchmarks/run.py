@@ -0,0 +1,322 @@
+"""
+离线基准测试：不连接 Telegram (使用 SimulatedBackend)，Qt 使用 offscreen 平台。
+
+用法 (在项目根目录):
+    python -m benchmarks.run                                  # 结果以 JSON 输出到标准输出
+    python -m benchmarks.run --output bench.json              # 保存结果
+    python -m benchmarks.run --baseline bench.json            # 与基线对比，变慢超过阈值时返回码为 1
+    python -m benchmarks.run --only send,ui --groups 1000,10000
+    python -m benchmarks.run --only memory --switches 50     # 反复切换账号，控件或内存未释放时返回码为 1
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import config as config_module  # noqa: E402
+from utils.config import config, new_account_config, new_schedule_entry  # noqa: E402
+
+results = {}
+leaks = {}  # 反复切换账号后控件数量或常驻内存仍在增长的项目: {名称: 说明}
+
+
+def record(name, samples, **extra):
+    """记录一项结果：samples 为每次重复的耗时 (秒)"""
+    results[name] = {
+        "seconds": statistics.median(samples),
+        "min_seconds": min(samples),
+        "repeat": len(samples),
+        **extra,
+    }
+    print(f"{name:<45} {results[name]['seconds'] * 1000:10.2f} ms", file=sys.stderr)
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def make_account(targets):
+    account_config = new_account_config()
+    account_config["target_chats"] = {str(-1000000000000 - i): f"群组 {i}" for i in range(targets)}
+    return account_config
+
+
+def reset_config(accounts=0, targets=0):
+    config.clear()
+    config.update({"accounts": {}, "window_width": 750, "window_height": 700})
+    for i in range(accounts):
+        config["accounts"][f"account_{i}"] = make_account(targets)
+
+
+# ==== 发送路径 ====
+def bench_send(args):
+    from core.backend import set_backend
+    from core.simulated_backend import SimulatedBackend
+    from core.telegram import send_message_to_chats
+
+    set_backend(SimulatedBackend(latency=0, latency_jitter=0, seed=1))
+    for chats in args.chats:
+        chat_map = {-1000000000000 - i: f"群组 {i}" for i in range(chats)}
+        chat_ids = list(chat_map)
+        for label, text in (("plain", "这是自动群发的消息 ✅"), ("template", "{chat_name} 你好 {date} #{index}/{total}")):
+            samples = timed(lambda: asyncio.run(send_message_to_chats("bench", chat_ids, text, chat_map)), args.repeat)
+            record(f"send.{label}.{chats}", samples, chats_per_second=chats / statistics.median(samples))
+    set_backend(None)
+
+
+# ==== 群组列表界面 ====
+def bench_ui(args):
+    from PyQt6.QtCore import Qt
+    from PyQt6.QtWidgets import QApplication, QCheckBox
+    from ui import control_panel
+
+    app = QApplication.instance() or QApplication([])
+    control_panel.save_config = lambda: None
+    reset_config()
+    callbacks = {"on_close": lambda: None, "update_schedule": lambda *a: None, "update_schedule_entry": lambda *a: None}
+
+    for groups in args.groups:
+        account_config = make_account(0)
+        panel = control_panel.ControlPanel("bench", account_config, callbacks)
+        panel.group_data = [(-1000000000000 - i, f"群组 {i}", "(新发现)") for i in range(groups)]
+
+        def update_listbox():
+            panel.update_listbox()
+            app.processEvents()
+
+        record(f"ui.update_listbox.{groups}", timed(update_listbox, args.repeat), groups=groups)
+
+        def checkbox_changed():
+            item = panel.list_widget.item(panel.list_widget.count() - 1)
+            checkbox = panel.list_widget.itemWidget(item).findChild(QCheckBox)
+            cid = item.data(Qt.ItemDataRole.UserRole)
+            state = Qt.CheckState.Unchecked if checkbox.isChecked() else Qt.CheckState.Checked
+            panel.on_checkbox_changed(state.value, cid, checkbox)
+            app.processEvents()
+
+        record(f"ui.on_checkbox_changed.{groups}", timed(checkbox_changed, args.repeat), groups=groups)
+
+        def select_all():
+            panel.on_select_all_changed(Qt.CheckState.Checked.value)
+            panel.on_select_all_changed(Qt.CheckState.Unchecked.value)
+            app.processEvents()
+
+        record(f"ui.on_select_all_changed.{groups}", timed(select_all, args.repeat), groups=groups)
+        panel.deleteLater()
+        app.processEvents()
+
+
+# ==== 切换账号时的内存 ====
+def rss_bytes():
+    """当前进程的常驻内存 (仅 Linux，其他平台返回 None)"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def bench_memory(args):
+    from PyQt6.QtCore import QEvent
+    from PyQt6.QtWidgets import QApplication
+    from ui import control_panel
+
+    app = QApplication.instance() or QApplication([])
+    control_panel.save_config = lambda: None
+    reset_config(accounts=5, targets=50)
+    callbacks = {"on_close": lambda: None, "update_schedule": lambda *a: None, "update_schedule_entry": lambda *a: None}
+    panel = None
+
+    def flush_deleted():
+        # 只有回到事件循环时 deleteLater() 才会真正删除控件，这里手动处理
+        app.processEvents()
+        QApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+
+    for groups in args.switch_groups:
+        group_list = [(-1000000000000 - i, f"群组 {i}") for i in range(groups)]
+
+        def switch(i=0):
+            # 与 App.run_control_panel 相同的流程：复用唯一的面板，显示完一个账号后释放
+            nonlocal panel
+            name = f"account_{i % 5}"
+            if panel is None:
+                panel = control_panel.ControlPanel(name, config["accounts"][name], callbacks)
+            else:
+                panel.load_account(name, config["accounts"][name])
+            panel.load_known_groups(group_list)
+            app.processEvents()
+            panel.release()
+            flush_deleted()
+
+        tracemalloc.start()
+        for i in range(2):  # 预热：首次创建面板、Qt 内部缓存
+            switch(i)
+        widgets_before = len(QApplication.allWidgets())
+        rss_before = rss_bytes()
+        python_before = tracemalloc.get_traced_memory()[0]
+        counter = iter(range(args.switches))
+        samples = timed(lambda: switch(next(counter)), args.switches)
+        widgets_after = len(QApplication.allWidgets())
+        rss_after = rss_bytes()
+        python_growth = tracemalloc.get_traced_memory()[0] - python_before
+        tracemalloc.stop()
+
+        name = f"memory.switch_accounts.{groups}"
+        rss_growth = rss_after - rss_before if rss_before is not None else None
+        record(name, samples, groups=groups, switches=args.switches, widgets_before=widgets_before,
+               widgets_after=widgets_after, rss_growth_bytes=rss_growth, python_growth_bytes=python_growth)
+        problems = []
+        if widgets_after > widgets_before:
+            problems.append(f"多出 {widgets_after - widgets_before} 个控件未释放")
+        # group_data / fetched_group_info 等 Python 数据没有释放时控件数量不变，用 tracemalloc 统计的 Python 内存判断
+        if python_growth > args.max_python_growth_mb * 1024 * 1024:
+            problems.append(f"Python 对象内存增长 {python_growth / 1024 / 1024:.1f} MB，超过 {args.max_python_growth_mb} MB")
+        if rss_growth is not None and rss_growth > args.max_rss_growth_mb * 1024 * 1024:
+            problems.append(f"常驻内存增长 {rss_growth / 1024 / 1024:.1f} MB，超过 {args.max_rss_growth_mb} MB")
+        if problems:
+            leaks[name] = "，".join(problems)
+
+    if panel is not None:
+        panel.deleteLater()
+        flush_deleted()
+
+
+# ==== 配置读写 ====
+def bench_config(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        original_file = config_module.CONFIG_FILE
+        config_module.CONFIG_FILE = os.path.join(tmp, "config.json")
+        try:
+            for accounts in args.accounts:
+                reset_config(accounts, args.targets)
+                config_module.save_config()
+                size = os.path.getsize(config_module.CONFIG_FILE)
+                record(f"config.save.{accounts}x{args.targets}", timed(config_module.save_config, args.repeat), bytes=size)
+                record(f"config.load.{accounts}x{args.targets}", timed(config_module.load_config, args.repeat), bytes=size)
+        finally:
+            config_module.CONFIG_FILE = original_file
+
+
+# ==== 调度器任务注册 ====
+def bench_scheduler(args):
+    from core import scheduler as scheduler_module
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler_module.JOBSTORE_FILE = os.path.join(tmp, "jobs.sqlite")
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        reset_config()
+        scheduler_module.initialize_scheduler(loop)
+        try:
+            for accounts in args.accounts:
+                def register():
+                    for job in scheduler_module.scheduler.get_jobs():
+                        job.remove()
+                    reset_config(accounts, 0)
+                    for account_config in config["accounts"].values():
+                        account_config["schedules"].append(new_schedule_entry(trigger="interval", interval_minutes=30))
+                    loop.run_until_complete(scheduler_module.restore_all_schedules())
+
+                record(f"scheduler.restore_all.{accounts}", timed(register, args.repeat), accounts=accounts)
+
+                # 已注册后再次对账 (例如重启或热加载)，应当几乎没有写入
+                resync = timed(lambda: loop.run_until_complete(scheduler_module.restore_all_schedules()), args.repeat)
+                record(f"scheduler.resync.{accounts}", resync, accounts=accounts)
+        finally:
+            scheduler_module.shutdown_scheduler()
+            loop.close()
+
+
+BENCHMARKS = {"send": bench_send, "ui": bench_ui, "memory": bench_memory, "config": bench_config,
+              "scheduler": bench_scheduler}
+
+
+def compare(baseline_file, threshold):
+    """与基线对比，返回变慢超过阈值的项目"""
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = json.load(f).get("results", {})
+    regressions = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["seconds"] / baseline[name]["seconds"] if baseline[name]["seconds"] else 1.0
+        result["baseline_seconds"] = baseline[name]["seconds"]
+        result["ratio"] = ratio
+        if ratio > 1 + threshold:
+            regressions[name] = ratio
+    return regressions
+
+
+def parse_sizes(text):
+    return [int(x) for x in text.split(",") if x]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TelegramController 离线基准测试")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="逗号分隔: " + ",".join(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chats", type=parse_sizes, default=[1000, 10000], help="发送路径的群组数量")
+    parser.add_argument("--groups", type=parse_sizes, default=[1000, 10000, 50000], help="群组列表界面的群组数量")
+    parser.add_argument("--switch-groups", type=parse_sizes, default=[5000], help="切换账号内存测试中每个账号的群组数量")
+    parser.add_argument("--switches", type=int, default=20, help="切换账号内存测试的切换次数")
+    parser.add_argument("--max-python-growth-mb", type=float, default=1,
+                        help="切换账号内存测试允许的 Python 对象内存增长 (MB，tracemalloc 统计)，超过视为泄漏")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=16,
+                        help="切换账号内存测试允许的常驻内存增长 (MB)，超过视为泄漏")
+    parser.add_argument("--accounts", type=parse_sizes, default=[100, 500], help="配置 / 调度器的账号数量")
+    parser.add_argument("--targets", type=int, default=500, help="配置读写时每个账号的已保存群组数量")
+    parser.add_argument("--output", help="结果 JSON 文件路径，默认输出到标准输出")
+    parser.add_argument("--baseline", help="基线结果 JSON 文件")
+    parser.add_argument("--threshold", type=float, default=0.2, help="相对基线变慢多少视为退化 (默认 0.2 即 20%%)")
+    args = parser.parse_args(argv)
+
+    # 日志照常格式化，但不写文件，避免磁盘 I/O 干扰结果
+    logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(open(os.devnull, "w", encoding="utf-8"))], force=True)
+
+    for name in args.only.split(","):
+        BENCHMARKS[name](args)
+
+    regressions = compare(args.baseline, args.threshold) if args.baseline else {}
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+        "regressions": regressions,
+        "leaks": leaks,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    for name, ratio in regressions.items():
+        print(f"⚠️ {name} 比基线慢 {ratio:.2f} 倍", file=sys.stderr)
+    for name, problem in leaks.items():
+        print(f"⚠️ {name} 反复切换账号后{problem}", file=sys.stderr)
+    return 1 if regressions or leaks else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import os
+from abc import ABC, abstractmethod
+
+from telethon import TelegramClient
+
+from core.session_storage import create_session
+from utils.config import config, API_ID, API_HASH
+from utils.helpers import app_path
+
+_backend = None
+
+
+class NotAuthorizedError(Exception):
+    """账号未登录或登录已失效，需要在界面中重新登录"""
+
+    def __init__(self, session_name):
+        super().__init__(f"账号 '{session_name}' 未登录或登录已失效，请重新登录")
+        self.session_name = session_name
+
+
+class BackendSession(ABC):
+    """
+    一个账号的一次连接。send / 获取群组等操作都通过它完成，用完必须 close()。
+    子类必须实现全部抽象方法，缺少方法的后端在创建时就会报错，而不是群发到一半才失败。
+    """
+
+    def __init__(self, session_name):
+        self.session_name = session_name
+
+    @abstractmethod
+    async def start(self):
+        """连接已登录的账号；未登录时抛出 NotAuthorizedError，不能交互式地要求登录"""
+
+    @abstractmethod
+    async def is_authorized(self):
+        """只连接并检查登录状态，不会像 start() 那样在未登录时要求输入手机号"""
+
+    @abstractmethod
+    async def send_message(self, chat_id, text):
+        ...
+
+    @abstractmethod
+    async def get_groups(self):
+        """返回 [(chat_id, title), ...]，只包含群组和频道"""
+
+    @abstractmethod
+    async def close(self):
+        ...
+
+
+class MessagingBackend(ABC):
+    """消息后端接口：根据账号名创建 BackendSession"""
+
+    name = "base"
+
+    @abstractmethod
+    def open_session(self, session_name) -> BackendSession:
+        ...
+
+
+class TelethonSession(BackendSession):
+    def __init__(self, session_name):
+        super().__init__(session_name)
+        session_file = os.path.join(app_path("session"), f"{session_name}.session")
+        self.client = TelegramClient(create_session(session_file), API_ID, API_HASH)
+
+    async def start(self):
+        # 不使用 client.start()：未登录时它会用 input() 在终端等待输入手机号，阻塞整个事件循环
+        await self.client.connect()
+        if not await self.client.is_user_authorized():
+            raise NotAuthorizedError(self.session_name)
+
+    async def is_authorized(self):
+        await self.client.connect()
+        return await self.client.is_user_authorized()
+
+    async def send_message(self, chat_id, text):
+        await self.client.send_message(chat_id, text)
+
+    async def get_groups(self):
+        dialogs = await self.client.get_dialogs()
+        return [(d.id, d.title) for d in dialogs if d.is_group or d.is_channel]
+
+    async def close(self):
+        if self.client.is_connected():
+            await self.client.disconnect()
+        else:
+            # 连接失败时 disconnect() 不会执行，需要自己关闭 session 以写回未保存的数据
+            self.client.session.close()
+
+
+class TelethonBackend(MessagingBackend):
+    """真实的 Telegram 后端"""
+
+    name = "telethon"
+
+    def open_session(self, session_name):
+        return TelethonSession(session_name)
+
+
+def create_backend(backend_config=None):
+    """
+    根据配置创建后端，例如 {"type": "simulated", "latency": 0.05, "flood_wait_rate": 0.01}。
+    环境变量 TGC_BACKEND 可以覆盖配置中的 type。
+    """
+    backend_config = dict(backend_config or {})
+    backend_type = os.environ.get("TGC_BACKEND") or backend_config.pop("type", "telethon")
+    backend_config.pop("type", None)
+    if backend_type == "simulated":
+        from core.simulated_backend import SimulatedBackend
+        return SimulatedBackend(**backend_config)
+    if backend_type != "telethon":
+        raise ValueError(f"未知的消息后端: {backend_type}")
+    return TelethonBackend()
+
+
+def get_backend() -> MessagingBackend:
+    global _backend
+    if _backend is None:
+        _backend = create_backend(config.get("backend"))
+    return _backend
+
+
+def set_backend(backend):
+    """替换当前后端 (用于压测 / 基准测试)；传入 None 时下次按配置重新创建"""
+    global _backend
+    _backend = backend
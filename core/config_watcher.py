@@ -0,0 +1,25 @@
+import asyncio
+import logging
+
+from core.scheduler import update_or_create_schedule
+from utils.config import reload_config_if_changed
+
+CONFIG_WATCH_INTERVAL = 2.0  # 检测 config.json 修改的间隔 (秒)
+
+
+async def watch_config(on_accounts_changed=None, interval=CONFIG_WATCH_INTERVAL):
+    """
+    定期检测 config.json 是否被外部修改 (例如部署工具)，合并修改后
+    只为发生变化的账号重新同步定时任务。
+    on_accounts_changed(changed) 用于通知界面刷新。
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            changed = reload_config_if_changed()
+            for session_name in changed:
+                await update_or_create_schedule(session_name)
+            if changed and on_accounts_changed:
+                on_accounts_changed(changed)
+        except Exception as e:
+            logging.error(f"❌ 处理 config.json 修改时发生错误: {e}", exc_info=True)
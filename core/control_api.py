@@ -0,0 +1,284 @@
+"""
+本地控制接口：不经过界面，直接在与调度器相同的事件循环中群发、查询账号和定时任务状态。
+
+    GET  /accounts               已保存的账号、已保存群组数量、定时任务数量和最近一次状态检查结果
+    GET  /schedules[?account=x]  定时任务配置和下次触发时间
+    POST /send                   批量群发，逐行 (NDJSON) 返回进度，例如:
+        {"sends": [{"account": "a", "chat_ids": [-100123, -100456], "message": "你好 {chat_name}"},
+                   {"account": "b"}]}
+        chat_ids 省略时发送到该账号全部已保存群组，message 省略时使用该账号的消息；同一批中每个账号只能出现一次
+
+必须在配置中设置 token，每个请求都要带 "Authorization: Bearer <token>"；
+带 Origin 头的请求 (浏览器中的网页发出的) 一律拒绝，POST 请求必须是 Content-Type: application/json。
+
+    curl -N -X POST http://127.0.0.1:<port>/send -H "Authorization: Bearer <token>" \
+         -H "Content-Type: application/json" -d '{"sends": [{"account": "a"}]}'
+"""
+import asyncio
+import hmac
+import json
+import logging
+import os
+import time
+import uuid
+from urllib.parse import parse_qs
+
+from core.discovery import get_chat_index
+from core.health import cached_health
+from core.scheduler import get_send_slots, list_schedules
+from core.telegram import send_message_to_chats
+from utils.config import config, DEFAULT_CONTROL_API_CONFIG
+from utils.helpers import list_sessions
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+REQUEST_TIMEOUT = 30  # 读取请求的超时时间 (秒)
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 415: "Unsupported Media Type",
+               500: "Internal Server Error"}
+
+_running_batches = set()  # 客户端断开后群发仍继续进行，保留引用直到完成
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# ==== 接口 ====
+async def handle_accounts(query, body):
+    accounts = []
+    for session_name in sorted(set(list_sessions()) | set(config.get("accounts", {}))):
+        account_config = config["accounts"].get(session_name, {})
+        health = cached_health(session_name)
+        accounts.append({
+            "account": session_name,
+            "configured": session_name in config["accounts"],
+            "target_chats": len(account_config.get("target_chats", {})),
+            "schedules": len(account_config.get("schedules", [])),
+            "health": {"status": health["status"], "detail": health["detail"]} if health else None,
+        })
+    return {"accounts": accounts}
+
+
+async def handle_schedules(query, body):
+    return {"schedules": list_schedules(query.get("account", [None])[0])}
+
+
+def _parse_sends(body):
+    """校验批量群发请求，返回 [(account, {chat_id: name}, message), ...]"""
+    try:
+        request = json.loads(body or b"{}")
+    except ValueError as e:
+        raise ApiError(400, f"请求不是合法的 JSON: {e}")
+    sends = request.get("sends") if isinstance(request, dict) else None
+    if not isinstance(sends, list) or not sends:
+        raise ApiError(400, "sends 必须是非空列表")
+
+    known_accounts = set(list_sessions())
+    chat_index = get_chat_index()
+    parsed = []
+    seen_accounts = set()
+    for item in sends:
+        account = item.get("account") if isinstance(item, dict) else None
+        if account not in known_accounts:
+            raise ApiError(400, f"未知的账号: {account}")
+        # 同一账号同时发起两次群发会并发使用同一个登录密钥，Telegram 可能拒绝
+        if account in seen_accounts:
+            raise ApiError(400, f"({account}) 在同一批中出现了多次")
+        seen_accounts.add(account)
+        account_config = config["accounts"].get(account, {})
+        target_chats = {int(k): v for k, v in account_config.get("target_chats", {}).items()}
+        chat_ids = item.get("chat_ids")
+        if chat_ids is None:
+            chat_ids = list(target_chats)
+        elif not isinstance(chat_ids, list) or not all(type(cid) is int for cid in chat_ids):
+            raise ApiError(400, f"({account}) chat_ids 必须是整数列表")
+        if not chat_ids:
+            raise ApiError(400, f"({account}) 没有发送目标")
+        message = item.get("message") or account_config.get("message_text", "")
+        if not isinstance(message, str):
+            raise ApiError(400, f"({account}) message 必须是字符串")
+        if not message:
+            raise ApiError(400, f"({account}) 消息内容为空")
+        chat_map = {cid: target_chats.get(cid) or chat_index.get(cid, {}).get("title", "未知群组") for cid in chat_ids}
+        parsed.append((account, chat_map, message))
+    return parsed
+
+
+async def handle_send(query, body):
+    sends = _parse_sends(body)
+    batch_id = uuid.uuid4().hex[:8]
+    total = sum(len(chat_map) for _, chat_map, _ in sends)
+    logging.info(f"🔌 控制接口群发 [{batch_id}]: {len(sends)} 个账号，共 {total} 个群组")
+    return _stream_batch(batch_id, sends, total)
+
+
+async def _stream_batch(batch_id, sends, total):
+    events = asyncio.Queue()
+    start_time = time.perf_counter()
+    send_slots = get_send_slots()
+
+    async def run_one(account, chat_map, message):
+        def on_progress(chat_id, error):
+            events.put_nowait({"event": "sent", "account": account, "chat_id": chat_id,
+                               "ok": error is None, "error": error})
+
+        # 与定时群发共用并发名额，避免同时连接过多账号
+        async with send_slots:
+            events.put_nowait({"event": "account_started", "account": account, "total": len(chat_map)})
+            success, result_message, sent_ids = await send_message_to_chats(
+                account, list(chat_map), message, chat_map, on_progress=on_progress)
+        events.put_nowait({"event": "account_done", "account": account, "success": success,
+                           "message": result_message, "sent": len(sent_ids), "total": len(chat_map)})
+        return len(sent_ids)
+
+    batch = asyncio.gather(*(run_one(*item) for item in sends), return_exceptions=True)
+    _running_batches.add(batch)
+    batch.add_done_callback(_running_batches.discard)
+    batch.add_done_callback(lambda _: events.put_nowait(None))
+
+    yield {"event": "accepted", "batch_id": batch_id, "accounts": len(sends), "total": total}
+    while (event := await events.get()) is not None:
+        yield event
+    sent = sum(result for result in batch.result() if isinstance(result, int))
+    logging.info(f"🔌 控制接口群发 [{batch_id}] 完成: {sent}/{total} 成功")
+    yield {"event": "done", "batch_id": batch_id, "sent": sent, "failed": total - sent,
+           "seconds": round(time.perf_counter() - start_time, 3)}
+
+
+ROUTES = {
+    "/accounts": ("GET", handle_accounts),
+    "/schedules": ("GET", handle_schedules),
+    "/send": ("POST", handle_send),
+}
+
+
+# ==== HTTP ====
+async def _read_request(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    request_line, *header_lines = head.decode("iso-8859-1").split("\r\n")
+    try:
+        method, target, _ = request_line.split(" ", 2)
+    except ValueError:
+        raise ApiError(400, "无法解析请求行")
+    headers = {}
+    for line in header_lines:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise ApiError(400, "Content-Length 不合法")
+    if length < 0:
+        raise ApiError(400, "Content-Length 不合法")
+    if length > MAX_BODY_BYTES:
+        raise ApiError(413, f"请求体超过 {MAX_BODY_BYTES} 字节")
+    body = await reader.readexactly(length) if length else b""
+    path, _, query_string = target.partition("?")
+    return method.upper(), path, parse_qs(query_string), headers, body
+
+
+def _response_head(status, content_type, length=None):
+    head = f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+    if length is not None:
+        head += f"Content-Length: {length}\r\n"
+    return (head + "Connection: close\r\n\r\n").encode("ascii")
+
+
+def _json_line(data):
+    return (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _make_handler(token):
+    async def handle_connection(reader, writer):
+        try:
+            try:
+                method, path, query, headers, body = await asyncio.wait_for(_read_request(reader), REQUEST_TIMEOUT)
+                # 浏览器中的网页也能向 localhost 发请求，带 Origin 的一律拒绝
+                if "origin" in headers:
+                    raise ApiError(403, "不接受来自浏览器的跨站请求")
+                if not hmac.compare_digest(headers.get("authorization", ""), f"Bearer {token}"):
+                    raise ApiError(401, "缺少或错误的 token")
+                route = ROUTES.get(path)
+                if route is None:
+                    raise ApiError(404, f"未知的接口: {path}")
+                if method != route[0]:
+                    raise ApiError(405, f"{path} 只支持 {route[0]}")
+                content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+                if method == "POST" and content_type != "application/json":
+                    raise ApiError(415, "请求必须是 Content-Type: application/json")
+                result = await route[1](query, body)
+            except ApiError as e:
+                payload = _json_line({"error": e.message})
+                writer.write(_response_head(e.status, "application/json; charset=utf-8", len(payload)) + payload)
+                return
+
+            if isinstance(result, dict):
+                payload = _json_line(result)
+                writer.write(_response_head(200, "application/json; charset=utf-8", len(payload)) + payload)
+                return
+            # 流式结果：每个事件一行 JSON，连接关闭表示结束
+            writer.write(_response_head(200, "application/x-ndjson; charset=utf-8"))
+            client_connected = True
+            async for event in result:
+                if not client_connected:
+                    continue  # 客户端已断开，群发照常完成
+                try:
+                    writer.write(_json_line(event))
+                    await writer.drain()
+                except ConnectionError:
+                    client_connected = False
+                    logging.warning("⚠️ 控制接口客户端已断开，群发继续在后台进行")
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        except Exception as e:
+            logging.error(f"❌ 控制接口处理请求失败: {e}", exc_info=True)
+            payload = _json_line({"error": f"{type(e).__name__}: {e}"})
+            writer.write(_response_head(500, "application/json; charset=utf-8", len(payload)) + payload)
+        finally:
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+    return handle_connection
+
+
+async def run_control_api(api_config=None):
+    """
+    按配置启动本地控制接口：port 不为空时监听 host:port，unix_socket 不为空时监听该 Unix socket。
+    两者都为空时直接返回；没有设置 token 时不启动 (任何本机进程都能借此群发)。
+    """
+    api_config = {**DEFAULT_CONTROL_API_CONFIG, **(api_config or {})}
+    if not (api_config.get("port") or api_config.get("unix_socket")):
+        return
+    token = api_config.get("token")
+    if not token:
+        logging.error("❌ 控制接口未启动: 必须在 control_api.token 中设置访问 token")
+        return
+    handler = _make_handler(token)
+    servers = []
+    try:
+        if api_config.get("port"):
+            host = api_config.get("host") or "127.0.0.1"
+            servers.append(await asyncio.start_server(handler, host, api_config["port"]))
+            logging.info(f"🔌 控制接口已启动: http://{host}:{api_config['port']}")
+        socket_path = api_config.get("unix_socket")
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            servers.append(await asyncio.start_unix_server(handler, socket_path))
+            logging.info(f"🔌 控制接口已启动: unix:{socket_path}")
+        if servers:
+            await asyncio.gather(*(server.serve_forever() for server in servers))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logging.error(f"❌ 启动控制接口失败: {e}")
+    finally:
+        for server in servers:
+            server.close()
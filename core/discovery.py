@@ -0,0 +1,162 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+
+from core.health import STATUS_AUTHORIZED, cached_health, check_account
+from core.telegram import get_group_ids_and_names
+from utils.helpers import app_path
+
+DISCOVERY_CONCURRENCY = 4  # 同时获取群组列表的账号数量上限
+INDEX_SAVE_DELAY = 2       # 单个账号更新后延迟多少秒写入，合并短时间内的多次更新
+CHAT_INDEX_FILE = app_path("chat_index.json")
+
+# {"accounts": {session_name: {"fetched_at": iso时间, "chats": [[chat_id, title], ...]}}}
+_index = None
+_merged = None  # 缓存: chat_id -> {"title": str, "accounts": [session_name, ...]}
+_save_task = None
+_save_lock = None
+
+
+def _load_index():
+    global _index
+    if _index is None:
+        _index = {"accounts": {}}
+        if os.path.exists(CHAT_INDEX_FILE):
+            try:
+                with open(CHAT_INDEX_FILE, "r", encoding="utf-8") as f:
+                    loaded = json.load(f)
+                if isinstance(loaded, dict):
+                    _index = loaded
+            except Exception as e:
+                logging.error(f"❌ 读取群组索引失败: {e}")
+        _index.setdefault("accounts", {})
+    return _index
+
+
+def _snapshot():
+    # 每个账号的数据在更新时整体替换、不会原地修改，浅拷贝后即可在其他线程中序列化
+    return {**_load_index(), "accounts": dict(_load_index()["accounts"])}
+
+
+def _write_index(data):
+    tmp_path = f"{CHAT_INDEX_FILE}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, CHAT_INDEX_FILE)
+    except Exception as e:
+        logging.error(f"❌ 保存群组索引失败: {e}")
+
+
+async def save_index():
+    """在线程池中原子地写入索引文件，不阻塞事件循环"""
+    global _save_lock
+    if _save_lock is None:
+        _save_lock = asyncio.Lock()
+    async with _save_lock:
+        await asyncio.get_running_loop().run_in_executor(None, _write_index, _snapshot())
+
+
+async def _save_index_later():
+    await asyncio.sleep(INDEX_SAVE_DELAY)
+    await save_index()
+
+
+def _schedule_save():
+    """延迟写入索引；没有运行中的事件循环时 (例如脚本中调用) 直接写入"""
+    global _save_task
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _write_index(_snapshot())
+        return
+    if _save_task is None or _save_task.done():
+        _save_task = loop.create_task(_save_index_later())
+
+
+async def flush_index():
+    """退出前立即写入尚在等待中的索引更新"""
+    if _save_task is not None and not _save_task.done():
+        _save_task.cancel()
+        await save_index()
+
+
+def update_account_chats(session_name, groups, save=True):
+    """用某个账号最新获取到的群组列表更新索引 (单个账号在控制面板中获取群组时也会调用)"""
+    global _merged
+    _load_index()["accounts"][session_name] = {
+        "fetched_at": datetime.now().isoformat(timespec="seconds"),
+        "chats": [[cid, title] for cid, title in groups],
+    }
+    _merged = None
+    if save:
+        _schedule_save()
+
+
+def get_chat_index():
+    """合并、去重后的索引: {chat_id: {"title": 标题, "accounts": [可以访问该群组的账号...]}}"""
+    global _merged
+    if _merged is None:
+        merged = {}
+        for session_name, data in sorted(_load_index()["accounts"].items()):
+            for cid, title in data["chats"]:
+                entry = merged.setdefault(cid, {"title": title, "accounts": []})
+                entry["accounts"].append(session_name)
+        _merged = merged
+    return _merged
+
+
+def chats_for_account(session_name):
+    """某个账号最近一次获取到的群组 [(chat_id, title), ...]，从未获取过时返回 None"""
+    data = _load_index()["accounts"].get(session_name)
+    return [(cid, title) for cid, title in data["chats"]] if data else None
+
+
+def exclusive_chats():
+    """只有一个账号能访问的群组: {chat_id: session_name}"""
+    return {cid: entry["accounts"][0] for cid, entry in get_chat_index().items() if len(entry["accounts"]) == 1}
+
+
+def unreachable_chats(session_name, chat_ids):
+    """返回不在该账号最近一次获取到的群组列表中的 chat_id；该账号从未获取过时返回空列表"""
+    known = chats_for_account(session_name)
+    if known is None:
+        return []
+    known_ids = {cid for cid, _ in known}
+    return [cid for cid in chat_ids if cid not in known_ids]
+
+
+async def discover_all_chats(session_names, on_progress=None, concurrency=DISCOVERY_CONCURRENCY):
+    """
+    并发获取所有账号的群组列表 (最多同时 concurrency 个) 并更新索引。
+    登录已失效的账号先通过状态检查跳过 (否则 Telethon 的 start() 会在终端等待输入手机号)，记入错误。
+    每完成一个账号调用 on_progress(已完成数, 总数)。返回 {session_name: 错误信息} (全部成功时为空)。
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = {}
+    done = 0
+
+    async def fetch(session_name):
+        nonlocal done
+        async with semaphore:
+            health = cached_health(session_name) or await check_account(session_name)
+            if health["status"] == STATUS_AUTHORIZED:
+                groups, error = await get_group_ids_and_names(session_name)
+            else:
+                groups, error = None, health["detail"]
+        if error:
+            errors[session_name] = error
+        else:
+            update_account_chats(session_name, groups, save=False)
+        done += 1
+        if on_progress:
+            on_progress(done, len(session_names))
+
+    await asyncio.gather(*(fetch(name) for name in session_names))
+    await save_index()
+    index = get_chat_index()
+    logging.info(f"✅ 跨账号群组汇总完成: {len(session_names) - len(errors)}/{len(session_names)} 个账号，"
+                 f"共 {len(index)} 个群组，其中 {len(exclusive_chats())} 个只有一个账号可访问")
+    return errors
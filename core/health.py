@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import time
+
+from core.backend import get_backend
+
+HEALTH_CHECK_CONCURRENCY = 8   # 同时检查的账号数量上限
+HEALTH_CHECK_TIMEOUT = 10      # 单个账号检查的超时时间 (秒)
+HEALTH_CACHE_TTL = 300         # 检查结果缓存时间 (秒)，期间重新打开登录窗口直接使用缓存
+
+STATUS_AUTHORIZED = "authorized"
+STATUS_EXPIRED = "expired"
+STATUS_ERROR = "error"
+
+# session_name -> {"status", "detail", "latency", "checked_at"}
+_health_cache = {}
+
+
+def cached_health(session_name):
+    """返回未过期的检查结果，没有则返回 None"""
+    health = _health_cache.get(session_name)
+    if health and time.monotonic() - health["checked_at"] < HEALTH_CACHE_TTL:
+        return health
+    return None
+
+
+def invalidate_health(session_name=None):
+    """账号重新登录 / 被删除后清除缓存"""
+    if session_name is None:
+        _health_cache.clear()
+    else:
+        _health_cache.pop(session_name, None)
+
+
+async def check_account(session_name, timeout=HEALTH_CHECK_TIMEOUT):
+    """连接一次并检查账号是否仍处于登录状态"""
+    session = None
+    start_time = time.perf_counter()
+    try:
+        session = get_backend().open_session(session_name)
+        authorized = await asyncio.wait_for(session.is_authorized(), timeout)
+        status, detail = (STATUS_AUTHORIZED, "") if authorized else (STATUS_EXPIRED, "登录已失效，需要重新登录")
+    except asyncio.TimeoutError:
+        status, detail = STATUS_ERROR, f"连接超时 ({timeout} 秒)"
+    except Exception as e:
+        status, detail = STATUS_ERROR, f"{type(e).__name__}: {e}"
+    finally:
+        if session is not None:
+            try:
+                await session.close()
+            except Exception:
+                pass
+    health = {"status": status, "detail": detail, "latency": time.perf_counter() - start_time,
+              "checked_at": time.monotonic()}
+    _health_cache[session_name] = health
+    if status != STATUS_AUTHORIZED:
+        logging.warning(f"⚠️ ({session_name}) 账号状态检查: {detail}")
+    return health
+
+
+async def check_accounts(session_names, on_result=None, force=False, concurrency=HEALTH_CHECK_CONCURRENCY):
+    """
+    并发检查多个账号 (最多同时 concurrency 个)，每得到一个结果就调用 on_result(session_name, health)。
+    缓存未过期的账号直接返回缓存结果，除非 force=True。
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check_one(session_name):
+        health = None if force else cached_health(session_name)
+        if health is None:
+            async with semaphore:
+                health = await check_account(session_name)
+        if on_result:
+            on_result(session_name, health)
+        return session_name, health
+
+    results = await asyncio.gather(*(check_one(name) for name in session_names))
+    return dict(results)
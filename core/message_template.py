@@ -0,0 +1,90 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+
+# 每个群组各不相同的变量
+CHAT_FIELDS = ("chat_name", "chat_id", "index")
+# 整次群发都相同的变量
+BROADCAST_FIELDS = ("account", "date", "time", "total")
+TEMPLATE_HELP = "可用变量: {chat_name} {chat_id} {index} {total} {account} {date} {time}，消息中用到变量时 {{ 和 }} 表示花括号本身"
+
+_TOKEN_RE = re.compile(r"\{\{|\}\}|\{(" + "|".join(CHAT_FIELDS + BROADCAST_FIELDS) + r")\}")
+
+
+class MessageTemplate:
+    """
+    预编译的消息模板：文本被切分为 (字面量, 变量名) 片段，群发时每个群组只做拼接。
+    未知的 {xxx} 原样保留；没有用到任何变量的消息连 {{ }} 也不转义，因此旧的纯文本消息 (例如 JSON) 发送内容不变。
+    """
+
+    __slots__ = ("text", "segments", "chat_fields")
+
+    def __init__(self, text):
+        self.text = text
+        self.segments = []  # [(literal, field_or_None)]
+        pos = 0
+        matches = list(_TOKEN_RE.finditer(text))
+        if not any(match.group(1) for match in matches):
+            matches = []  # 纯文本消息，原样发送
+        for match in matches:
+            token = match.group(0)
+            literal = text[pos:match.start()]
+            if token in ("{{", "}}"):
+                self.segments.append((literal + token[0], None))
+            else:
+                self.segments.append((literal, match.group(1)))
+            pos = match.end()
+        self.segments.append((text[pos:], None))
+        self.chat_fields = tuple(f for f in CHAT_FIELDS if any(field == f for _, field in self.segments))
+
+    @property
+    def is_static(self):
+        return all(field is None for _, field in self.segments)
+
+    def renderer(self, account="", total=0, now=None):
+        """
+        绑定整次群发的变量，返回 render(chat_id, chat_name, index) 函数。
+        渲染结果按所用到的群组变量缓存，结果相同的群组直接复用。
+        """
+        if self.is_static:
+            static_text = "".join(literal for literal, _ in self.segments)
+            return lambda chat_id, chat_name, index: static_text
+
+        now = now or datetime.now()
+        context = {"account": account, "total": total, "date": now.strftime("%Y-%m-%d"), "time": now.strftime("%H:%M")}
+        # 先把整次群发都相同的变量填好，并合并相邻的字面量
+        parts = []
+        for literal, field in self.segments:
+            parts.append(literal)
+            if field in CHAT_FIELDS:
+                parts.append((field,))
+            elif field is not None:
+                parts.append(str(context[field]))
+        merged = []
+        for part in parts:
+            if isinstance(part, str) and merged and isinstance(merged[-1], str):
+                merged[-1] += part
+            else:
+                merged.append(part)
+
+        if not self.chat_fields:
+            bound_text = "".join(merged)
+            return lambda chat_id, chat_name, index: bound_text
+
+        chat_fields = self.chat_fields
+        cache = {}
+
+        def render(chat_id, chat_name, index):
+            values = {"chat_id": chat_id, "chat_name": chat_name, "index": index}
+            key = tuple(values[f] for f in chat_fields)
+            text = cache.get(key)
+            if text is None:
+                text = cache[key] = "".join(p if isinstance(p, str) else str(values[p[0]]) for p in merged)
+            return text
+
+        return render
+
+
+@lru_cache(maxsize=64)
+def compile_template(text):
+    return MessageTemplate(text)
@@ -1,19 +1,105 @@
+import asyncio
 import logging
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_MISSED, EVENT_JOB_ADDED, EVENT_JOB_REMOVED
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.base import BaseTrigger
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
-from utils.config import config, DEFAULT_ACCOUNT_CONFIG
+from utils.config import config, find_schedule_entry, DEFAULT_SCHEDULER_CONFIG, JOBSTORE_FILE
+from core.discovery import unreachable_chats, exclusive_chats
 from core.telegram import send_message_to_chats
+from utils.metrics import SCHEDULER_LAG_SECONDS, SCHEDULER_MISSED, SCHEDULER_QUEUED_SECONDS, SCHEDULED_JOBS
 
 scheduler = AsyncIOScheduler()
+_send_slots = None  # (上限, asyncio.Semaphore)，限制同时执行的定时群发数量
+
+
+class StaggeredTrigger(BaseTrigger):
+    """
+    在原始触发器的基础上整体延后固定的 offset 秒，再随机延后 0~jitter 秒。
+    offset 由账号名决定，所以每个账号每次的触发时间都是可预期的。
+    """
+
+    __slots__ = 'trigger', 'offset', 'jitter'
+
+    def __init__(self, trigger, offset=0, jitter=0):
+        self.trigger = trigger
+        self.offset = offset
+        self.jitter = jitter
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        offset = timedelta(seconds=self.offset)
+        # 与 CronTrigger 相同，从上一次触发之后开始计算；jitter 只会往后延，所以不会重复触发同一时刻
+        start = min(now, previous_fire_time + timedelta(microseconds=1)) if previous_fire_time else now
+        next_fire_time = self.trigger.get_next_fire_time(None, start - offset)
+        if next_fire_time is None:
+            return None
+        return self._apply_jitter(next_fire_time + offset, self.jitter, now)
+
+    def __getstate__(self):
+        return {'version': 1, 'trigger': self.trigger, 'offset': self.offset, 'jitter': self.jitter}
+
+    def __setstate__(self, state):
+        self.trigger = state['trigger']
+        self.offset = state['offset']
+        self.jitter = state['jitter']
+
+    def __str__(self):
+        return f"{self.trigger} +{self.offset}s (jitter {self.jitter}s)"
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} ({self.trigger!r}, offset={self.offset}, jitter={self.jitter})>"
+
+
+def _scheduler_config():
+    return {**DEFAULT_SCHEDULER_CONFIG, **config.get("scheduler", {})}
+
+def _job_policy():
+    """从配置中读取错过触发 (misfire) 的补发策略"""
+    scheduler_config = _scheduler_config()
+    return {
+        "misfire_grace_time": scheduler_config["misfire_grace_seconds"],
+        "coalesce": bool(scheduler_config["coalesce"]),
+    }
+
+def _on_job_event(event):
+    """
+    记录调度延迟 (实际提交时间 - 计划时间)、被跳过的任务和任务数量。
+    提交之后因并发上限排队的时间另外记录在 tgc_scheduler_queued_seconds 中 (见 run_scheduled_send)
+    """
+    if event.code == EVENT_JOB_MISSED:
+        SCHEDULER_MISSED.inc()
+        return
+    if event.code in (EVENT_JOB_ADDED, EVENT_JOB_REMOVED):
+        SCHEDULED_JOBS.inc(1 if event.code == EVENT_JOB_ADDED else -1)
+        return
+    now = datetime.now(timezone.utc)
+    for run_time in event.scheduled_run_times:
+        SCHEDULER_LAG_SECONDS.observe(max(0.0, (now - run_time).total_seconds()))
 
 def initialize_scheduler(loop=None):
-    """启动调度器"""
+    """
+    启动调度器。任务保存在本地 SQLite 中，重启后会自动恢复，
+    并按 misfire / coalesce 策略补发停机期间错过的任务。
+    需要在 load_config 之后调用。
+    """
     try:
-        # 如果 scheduler 实例还没有被赋予 event_loop，在这里赋予它
-        if not getattr(scheduler, 'event_loop', None) and loop:
-            scheduler.configure(event_loop=loop)
-
         if not scheduler.running:
+            options = {
+                "jobstores": {"default": SQLAlchemyJobStore(url=f"sqlite:///{JOBSTORE_FILE}")},
+                "job_defaults": _job_policy(),
+            }
+            # 如果 scheduler 实例还没有被赋予 event_loop，在这里赋予它
+            if not getattr(scheduler, 'event_loop', None) and loop:
+                options["event_loop"] = loop
+            scheduler.configure(**options)
+            scheduler.add_listener(_on_job_event, EVENT_JOB_SUBMITTED | EVENT_JOB_MISSED | EVENT_JOB_ADDED | EVENT_JOB_REMOVED)
             scheduler.start()
             logging.info("🕒 后台定时任务调度器已启动")
     except Exception as e:
@@ -28,30 +114,167 @@ def shutdown_scheduler():
     except Exception as e:
         logging.error(f"❌ 关闭调度器失败: {e}")
 
+def schedule_job_id(session_name: str, schedule_id: str) -> str:
+    return f"send:{session_name}:{schedule_id}"
+
+def build_trigger(entry: dict):
+    """根据单条定时任务配置构建 APScheduler 触发器，配置不合法时抛出 ValueError"""
+    if entry.get("trigger") == "interval":
+        minutes = int(entry.get("interval_minutes", 0))
+        if minutes <= 0:
+            raise ValueError("间隔分钟数必须大于 0")
+        return IntervalTrigger(minutes=minutes)
+    return CronTrigger.from_crontab(entry.get("cron", ""))
+
+def account_stagger_offset(session_name: str, window: int) -> int:
+    """账号在错峰窗口内的固定偏移秒数 (crc32 在不同进程间保持一致，不受 hash 随机化影响)"""
+    if window <= 0:
+        return 0
+    return zlib.crc32(session_name.encode("utf-8")) % (int(window) + 1)
+
+def build_account_trigger(session_name: str, entry: dict):
+    """为账号的某条定时任务构建错峰后的触发器"""
+    scheduler_config = _scheduler_config()
+    offset = account_stagger_offset(session_name, scheduler_config["stagger_window_seconds"])
+    return StaggeredTrigger(build_trigger(entry), offset, int(scheduler_config["jitter_seconds"]))
+
+def get_send_slots():
+    """定时群发和控制接口的群发共用的并发名额 (scheduler.max_concurrent_sends)"""
+    global _send_slots
+    limit = max(1, int(_scheduler_config()["max_concurrent_sends"]))
+    if _send_slots is None or _send_slots[0] != limit:
+        _send_slots = (limit, asyncio.Semaphore(limit))
+    return _send_slots[1]
+
+def resolve_schedule_targets(account_config: dict, entry: dict) -> dict:
+    """返回该定时任务实际要发送的 {chat_id: name}，target_ids 为空表示账号的全部已保存群组"""
+    target_chats = {int(k): v for k, v in account_config.get("target_chats", {}).items()}
+    subset = {int(k) for k in entry.get("target_ids", [])}
+    if subset:
+        return {cid: name for cid, name in target_chats.items() if cid in subset}
+    return target_chats
+
+async def run_scheduled_send(session_name: str, schedule_id: str):
+    """定时任务的执行入口：触发时才读取最新配置，因此修改消息或目标无需重建任务"""
+    account_config = config["accounts"].get(session_name)
+    entry = find_schedule_entry(account_config, schedule_id)
+    if not entry or not entry.get("enabled", True):
+        logging.info(f"⏰ ({session_name}) 定时任务 {schedule_id} 已删除或停用，跳过")
+        return
+    target_chats_map = resolve_schedule_targets(account_config, entry)
+    if not target_chats_map:
+        logging.info(f"⏰ ({session_name}) 定时任务 {schedule_id} 没有发送目标，跳过")
+        return
+    unreachable = unreachable_chats(session_name, target_chats_map.keys())
+    if unreachable:
+        owners = exclusive_chats()
+        hints = [f"{target_chats_map[cid]}" + (f" (仅 {owners[cid]} 可访问)" if cid in owners else "") for cid in unreachable]
+        logging.warning(f"⚠️ ({session_name}) 定时任务 {schedule_id} 的 {len(unreachable)} 个目标不在该账号最近获取到的群组中: "
+                        + "，".join(hints))
+    message_text = entry.get("message_text") or account_config.get("message_text", "")
+    logging.info(f"⏰ 定时任务触发: ({session_name}) [{schedule_id}]")
+    send_slots = get_send_slots()
+    if send_slots.locked():
+        logging.info(f"⏰ ({session_name}) 同时执行的定时群发已达上限，排队等待")
+    queued_since = time.perf_counter()
+    async with send_slots:
+        SCHEDULER_QUEUED_SECONDS.observe(time.perf_counter() - queued_since)
+        await send_message_to_chats(session_name, list(target_chats_map.keys()), message_text, target_chats_map)
+
+def list_schedules(session_name: str = None) -> list:
+    """返回定时任务的当前状态 (配置 + 下次触发时间)，可只返回某个账号的"""
+    jobs = {job.id: job for job in scheduler.get_jobs()} if scheduler.running else {}
+    schedules = []
+    for account, account_config in config.get("accounts", {}).items():
+        if session_name is not None and account != session_name:
+            continue
+        for entry in account_config.get("schedules", []):
+            job_id = schedule_job_id(account, entry["id"])
+            job = jobs.get(job_id)
+            next_run_time = job.next_run_time if job else None
+            schedules.append({**entry, "account": account, "job_id": job_id,
+                              "next_run_time": next_run_time.isoformat() if next_run_time else None})
+    return schedules
+
+def _account_jobs(session_name: str):
+    return [job for job in scheduler.get_jobs()
+            if job.id.startswith("send:") and job.args and job.args[0] == session_name]
+
+def _sync_schedule_entry(session_name: str, schedule_id: str, job, policy: dict):
+    account_config = config["accounts"].get(session_name)
+    entry = find_schedule_entry(account_config, schedule_id)
+    job_id = schedule_job_id(session_name, schedule_id)
+
+    if not entry or not entry.get("enabled", True):
+        if job:
+            scheduler.remove_job(job_id)
+            logging.info(f"🕒 ({session_name}) 定时任务 {schedule_id} 已移除")
+        return
+
+    try:
+        trigger = build_account_trigger(session_name, entry)
+    except ValueError as e:
+        logging.error(f"❌ ({session_name}) 定时任务 {schedule_id} 配置不合法: {e}")
+        return
+
+    if job:
+        # 触发时间没变就不动它，避免间隔任务的下次执行时间被重置 (也保留了持久化的待补发时间)
+        if str(job.trigger) != str(trigger):
+            scheduler.reschedule_job(job_id, trigger=trigger)
+            logging.info(f"🕒 ({session_name}) 定时任务 {schedule_id} 已改为 {trigger}")
+        if any(getattr(job, key) != value for key, value in policy.items()):
+            scheduler.modify_job(job_id, **policy)
+    else:
+        scheduler.add_job(run_scheduled_send, trigger, args=[session_name, schedule_id], id=job_id,
+                          replace_existing=True, **policy)
+        logging.info(f"🕒 ({session_name}) 定时任务 {schedule_id} 已设置为 {trigger}")
+
+def _sync_account_schedules(session_name: str, account_jobs: list, policy: dict):
+    account_config = config["accounts"].get(session_name, {})
+    schedule_ids = [entry["id"] for entry in account_config.get("schedules", [])]
+    jobs_by_id = {}
+    for job in account_jobs:
+        if job.args[1] in schedule_ids:
+            jobs_by_id[job.id] = job
+        else:
+            scheduler.remove_job(job.id)
+            logging.info(f"🕒 ({session_name}) 定时任务 {job.args[1]} 已移除")
+
+    for schedule_id in schedule_ids:
+        job_id = schedule_job_id(session_name, schedule_id)
+        _sync_schedule_entry(session_name, schedule_id, jobs_by_id.get(job_id), policy)
+
+async def update_or_create_schedule_entry(session_name: str, schedule_id: str):
+    """
+    只针对一条定时任务进行新增 / 修改 / 删除，不影响该账号的其他任务。
+    """
+    job = scheduler.get_job(schedule_job_id(session_name, schedule_id))
+    _sync_schedule_entry(session_name, schedule_id, job, _job_policy())
+
 async def update_or_create_schedule(session_name: str):
     """
-    根据最新配置，为指定账号更新或创建定时发送任务。
-    """
-    account_config = config["accounts"].get(session_name, DEFAULT_ACCOUNT_CONFIG)
-    target_ids = [int(k) for k in account_config.get("target_chats", {}).keys()]
-    target_chats_map = {int(k): v for k, v in account_config.get("target_chats", {}).items()}
-    job_id = f"daily_send_{session_name}"
-
-    if scheduler.get_job(job_id):
-        scheduler.remove_job(job_id)
-
-    if target_ids:
-        async def scheduled_send_wrapper():
-            logging.info(f"⏰ 定时任务触发: ({session_name})")
-            await send_message_to_chats(session_name, target_ids, account_config["message_text"], target_chats_map)
-
-        scheduler.add_job(
-            scheduled_send_wrapper,
-            "cron",
-            hour=account_config["send_hour"],
-            minute=account_config["send_minute"],
-            id=job_id
-        )
-        logging.info(f"🕒 ({session_name}) 定时任务已更新为 {account_config['send_hour']}:{account_config['send_minute']:02d}")
-    else:
-        logging.info(f"🕒 ({session_name}) 没有发送目标，定时任务未设置")
\ No newline at end of file
+    根据最新配置，同步指定账号的所有定时发送任务。
+    """
+    # 旧版本的单一每日任务
+    if scheduler.get_job(f"daily_send_{session_name}"):
+        scheduler.remove_job(f"daily_send_{session_name}")
+    _sync_account_schedules(session_name, _account_jobs(session_name), _job_policy())
+
+async def restore_all_schedules():
+    """
+    启动时一次性同步所有账号的定时任务：只读取一次持久化的任务库并与 config 对账，
+    不连接 Telegram，也不需要打开任何账号的控制面板。
+    """
+    accounts = config.get("accounts", {})
+    jobs_by_account = {session_name: [] for session_name in accounts}
+    for job in scheduler.get_jobs():
+        if job.id.startswith("send:") and job.args and job.args[0] in accounts:
+            jobs_by_account[job.args[0]].append(job)
+        else:
+            scheduler.remove_job(job.id)
+
+    policy = _job_policy()
+    for session_name, account_jobs in jobs_by_account.items():
+        _sync_account_schedules(session_name, account_jobs, policy)
+    SCHEDULED_JOBS.set(len(scheduler.get_jobs()))
+    logging.info(f"🕒 已恢复 {len(accounts)} 个账号的 {SCHEDULED_JOBS.value()} 个定时任务")
@@ -0,0 +1,170 @@
+import asyncio
+import atexit
+import logging
+import os
+import sqlite3
+import time
+
+from telethon.sessions import SQLiteSession
+
+from utils.config import config, DEFAULT_SESSION_STORAGE_CONFIG
+from utils.metrics import SESSION_FLUSH_SECONDS
+
+# 文件路径 -> _SessionStore；同一个 .session 文件同时被多个客户端使用时 (例如检查状态和群发同时进行) 共用一份内存数据
+_stores = {}
+
+
+def _storage_config():
+    return {**DEFAULT_SESSION_STORAGE_CONFIG, **config.get("session_storage", {})}
+
+
+class _SessionStore:
+    """一个 .session 文件在内存中的副本，由 BufferedSQLiteSession 共用"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.refs = 0
+        self.deleted = False
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        if os.path.exists(filename):
+            # 用 SQLite 自带的 backup 读取，旧版本的表结构之后由 SQLiteSession 照常升级
+            source = sqlite3.connect(filename)
+            try:
+                source.backup(self.conn)
+            finally:
+                source.close()
+        self.flushed_changes = self.conn.total_changes
+        self.last_flush = time.monotonic()
+
+    @property
+    def dirty(self):
+        return self.conn.total_changes != self.flushed_changes
+
+    def flush(self, force=False):
+        """有未写入的修改时，把内存中的数据整体写入临时文件再替换原文件，不会留下写了一半的 .session"""
+        if self.deleted or not (force or self.dirty):
+            return
+        with SESSION_FLUSH_SECONDS.time():
+            self.conn.commit()
+            tmp_path = f"{self.filename}.tmp"
+            target = sqlite3.connect(tmp_path)
+            try:
+                self.conn.backup(target)
+            finally:
+                target.close()
+            os.replace(tmp_path, self.filename)
+        self.flushed_changes = self.conn.total_changes
+        self.last_flush = time.monotonic()
+
+    def flush_if_due(self, interval):
+        if self.dirty and time.monotonic() - self.last_flush >= interval:
+            self.flush()
+
+
+def _acquire_store(filename):
+    store = _stores.get(filename)
+    if store is None:
+        store = _stores[filename] = _SessionStore(filename)
+    store.refs += 1
+    return store
+
+
+def _release_store(store):
+    store.refs -= 1
+    if store.refs > 0:
+        return
+    _stores.pop(store.filename, None)
+    try:
+        store.flush()
+    except Exception as e:
+        logging.error(f"❌ 写入 session 文件失败 ({store.filename}): {e}")
+    store.conn.close()
+
+
+class BufferedSQLiteSession(SQLiteSession):
+    """
+    与 Telethon 默认的 SQLiteSession 使用相同的 .session 文件格式，但数据保存在内存中：
+    save() 只提交到内存，每隔 flush_interval 秒、登录信息变化时以及关闭时才原子地写回磁盘。
+    群发和获取群组时大量的实体缓存 / 更新状态写入因此不会逐条落盘阻塞事件循环。
+    """
+
+    def __init__(self, session_id, flush_interval=None):
+        self._store = None
+        self._closed = False
+        self.flush_interval = flush_interval if flush_interval is not None else \
+            _storage_config()["flush_interval_seconds"]
+        super().__init__(session_id)
+
+    def clone(self, to_instance=None):
+        # CDN 等临时连接使用的副本不需要写入磁盘，与 Telethon 默认行为一样放在内存中
+        return super().clone(to_instance or SQLiteSession())
+
+    def _cursor(self):
+        if self._closed:
+            # 关闭后重新获取共享数据会增加一个永远不会释放的引用，内存中的副本因此一直留着
+            raise RuntimeError(f"session 已关闭: {self.filename}")
+        if self._conn is None:
+            self._store = _acquire_store(os.path.abspath(self.filename))
+            self._conn = self._store.conn
+        return self._conn.cursor()
+
+    def _update_session_table(self):
+        super()._update_session_table()
+        # 登录密钥 / 数据中心变化很少发生，但丢失后需要重新登录，立即写入
+        self._store.flush()
+
+    def save(self):
+        if self._conn is not None:
+            self._conn.commit()
+            self._store.flush_if_due(self.flush_interval)
+
+    def close(self):
+        self._closed = True
+        if self._conn is not None:
+            self._conn.commit()
+            self._conn = None
+            store, self._store = self._store, None
+            _release_store(store)
+
+    def delete(self):
+        if self._store is not None:
+            self._store.deleted = True
+        return super().delete()
+
+
+def create_session(session_file):
+    """
+    按配置创建 Telethon 客户端使用的 session，例如 {"type": "buffered", "flush_interval_seconds": 30}。
+    环境变量 TGC_SESSION_STORAGE 可以覆盖配置中的 type；默认的 "sqlite" 为 Telethon 默认的逐条写入磁盘。
+    """
+    storage_config = _storage_config()
+    storage_type = os.environ.get("TGC_SESSION_STORAGE") or storage_config["type"]
+    if storage_type == "sqlite":
+        return session_file
+    if storage_type != "buffered":
+        raise ValueError(f"未知的 session 存储方式: {storage_type}")
+    return BufferedSQLiteSession(session_file, storage_config["flush_interval_seconds"])
+
+
+def flush_all_sessions(force=False):
+    """把所有仍在使用的 session 中未写入的修改写回磁盘"""
+    for store in list(_stores.values()):
+        try:
+            store.flush(force)
+        except Exception as e:
+            logging.error(f"❌ 写入 session 文件失败 ({store.filename}): {e}")
+
+
+async def run_session_flusher():
+    """后台定期写回长时间没有调用 save() 的 session (例如只接收更新、没有主动操作的账号)"""
+    while True:
+        interval = _storage_config()["flush_interval_seconds"]
+        await asyncio.sleep(interval)
+        for store in list(_stores.values()):
+            try:
+                store.flush_if_due(interval)
+            except Exception as e:
+                logging.error(f"❌ 写入 session 文件失败 ({store.filename}): {e}")
+
+
+atexit.register(flush_all_sessions)
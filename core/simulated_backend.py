@@ -0,0 +1,104 @@
+import asyncio
+import random
+import zlib
+from collections import Counter
+
+from telethon import errors
+
+from core.backend import BackendSession, MessagingBackend, NotAuthorizedError
+
+SIMULATED_CHAT_ID_BASE = -1000000000000
+
+
+class SimulatedSession(BackendSession):
+    def __init__(self, backend, session_name):
+        super().__init__(session_name)
+        self.backend = backend
+        self.connected = False
+
+    async def start(self):
+        await self.backend.delay()
+        # 与 TelethonSession 一致：未登录 / 等待两步验证密码的账号都抛出 NotAuthorizedError
+        if self.session_name in self.backend.unauthorized_accounts | self.backend.password_accounts:
+            raise NotAuthorizedError(self.session_name)
+        self.connected = True
+        self.backend.stats["connects"] += 1
+
+    async def is_authorized(self):
+        await self.backend.delay()
+        self.connected = True
+        # 与 Telethon 一致：等待输入两步验证密码的账号也算未登录
+        return self.session_name not in self.backend.unauthorized_accounts | self.backend.password_accounts
+
+    async def send_message(self, chat_id, text):
+        backend = self.backend
+        await backend.delay()
+        roll = backend.random.random()
+        if roll < backend.flood_wait_rate:
+            backend.stats["flood_waits"] += 1
+            raise errors.FloodWaitError(request=None, capture=backend.flood_wait_seconds)
+        if roll < backend.flood_wait_rate + backend.forbidden_rate:
+            backend.stats["forbidden"] += 1
+            raise errors.ChatWriteForbiddenError(request=None)
+        backend.stats["sent"] += 1
+        backend.sent_messages[self.session_name] += 1
+
+    async def get_groups(self):
+        await self.backend.delay(self.backend.dialogs_per_account / 1000)
+        return self.backend.dialogs_for(self.session_name)
+
+    async def close(self):
+        self.connected = False
+
+
+class SimulatedBackend(MessagingBackend):
+    """
+    完全在内存中的 Telegram 模拟后端，用于离线压测发送、调度和获取群组的流程。
+
+    - latency / latency_jitter: 每个请求的耗时 (秒)
+    - flood_wait_rate / flood_wait_seconds: 发送时抛出 FloodWaitError 的概率和等待秒数
+    - forbidden_rate: 发送时抛出 ChatWriteForbiddenError 的概率
+    - dialogs_per_account: 每个账号的群组数；不同账号之间的群组会部分重叠
+    - password_accounts / unauthorized_accounts: 等待两步验证密码 / 未登录的账号，start() 时抛出 NotAuthorizedError
+    """
+
+    name = "simulated"
+
+    def __init__(self, latency=0.05, latency_jitter=0.02, flood_wait_rate=0.0, flood_wait_seconds=30,
+                 forbidden_rate=0.0, dialogs_per_account=200, password_accounts=(), unauthorized_accounts=(),
+                 seed=None):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.flood_wait_rate = flood_wait_rate
+        self.flood_wait_seconds = flood_wait_seconds
+        self.forbidden_rate = forbidden_rate
+        self.dialogs_per_account = dialogs_per_account
+        self.password_accounts = set(password_accounts)
+        self.unauthorized_accounts = set(unauthorized_accounts)
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        self.sent_messages = Counter()
+        self._dialogs = {}
+
+    def open_session(self, session_name):
+        return SimulatedSession(self, session_name)
+
+    async def delay(self, extra=0.0):
+        seconds = self.latency + extra
+        if self.latency_jitter:
+            seconds += self.random.uniform(0, self.latency_jitter)
+        await asyncio.sleep(seconds)
+
+    def dialogs_for(self, session_name):
+        """按账号名生成固定的群组列表，同一账号每次结果相同"""
+        dialogs = self._dialogs.get(session_name)
+        if dialogs is None:
+            count = self.dialogs_per_account
+            universe = max(1, count * 3 // 2)
+            start = zlib.crc32(session_name.encode("utf-8")) % universe
+            dialogs = []
+            for i in range(count):
+                n = (start + i) % universe
+                dialogs.append((SIMULATED_CHAT_ID_BASE - n, f"模拟群组 {n}"))
+            self._dialogs[session_name] = dialogs
+        return list(dialogs)
@@ -1,49 +1,93 @@
+import asyncio
 import logging
-import os
+import time
 
-from telethon import TelegramClient, errors
-from utils.config import API_ID, API_HASH
-from utils.helpers import app_path
+from telethon import errors
 
+from core.backend import get_backend, NotAuthorizedError
+from core.message_template import compile_template
+from utils.diagnostics import profiled
+from utils.metrics import (MESSAGES_SENT, SEND_FAILURES, FLOOD_WAIT_SECONDS, SEND_LATENCY, BROADCASTS_IN_PROGRESS,
+                           DIALOG_FETCH_SECONDS)
 
-async def send_message_to_chats(session_name, chat_ids, message_text, chat_id_to_name_map : dict):
-    session_folder = app_path("session")
-    session_file = os.path.join(session_folder, f"{session_name}.session")
-    client = TelegramClient(session_file, API_ID, API_HASH)
+
+# 账号名 -> asyncio.Lock：同一账号的群发 (界面、定时任务、控制接口) 依次进行，不会并发使用同一个登录密钥
+_account_send_locks = {}
+
+
+def _account_send_lock(session_name):
+    lock = _account_send_locks.get(session_name)
+    if lock is None:
+        lock = _account_send_locks[session_name] = asyncio.Lock()
+    return lock
+
+
+async def send_message_to_chats(session_name, chat_ids, message_text, chat_id_to_name_map : dict, on_progress=None):
+    """
+    逐个群组发送；on_progress(chat_id, error) 在每个群组发送后调用，成功时 error 为 None。
+    同一账号同时只进行一次群发，后来的请求排队等待。
+    """
+    lock = _account_send_lock(session_name)
+    if lock.locked():
+        logging.info(f"⏳ ({session_name}) 该账号正在群发，排队等待")
+    async with lock:
+        return await _send_message_to_chats(session_name, chat_ids, message_text, chat_id_to_name_map, on_progress)
+
+
+@profiled("send")
+async def _send_message_to_chats(session_name, chat_ids, message_text, chat_id_to_name_map, on_progress):
+    session = get_backend().open_session(session_name)
     sent_ids = []  # 用于记录成功发送的ID
+    # 模板在整次群发中只编译、绑定一次，逐个群组渲染时走缓存
+    render = compile_template(message_text).renderer(account=session_name, total=len(chat_ids))
+    BROADCASTS_IN_PROGRESS.inc()
     try:
-        await client.start()
-        for chat_id in chat_ids:
+        await session.start()
+        for index, chat_id in enumerate(chat_ids, 1):
+            start_time = time.perf_counter()
             try:
                 chat_name = chat_id_to_name_map.get(chat_id, "未知群组")  # 使用 .get() 以防万一找不到
-                await client.send_message(chat_id, message_text)
-                logging.info(f"✅ ({session_name}) 已发送到 {chat_id} {chat_name}")
+                await session.send_message(chat_id, render(chat_id, chat_name, index))
+                latency = time.perf_counter() - start_time
+                SEND_LATENCY.observe(latency, account=session_name)
+                MESSAGES_SENT.inc(account=session_name)
+                logging.info(f"✅ ({session_name}) 已发送到 {chat_id} {chat_name}",
+                             extra={"session": session_name, "chat_id": chat_id, "latency_ms": round(latency * 1000, 1)})
                 sent_ids.append(chat_id)  # 记录成功
+                if on_progress:
+                    on_progress(chat_id, None)
             except Exception as e:
-                logging.error(f"❌ ({session_name}) 发送到 {chat_id} {chat_name} 失败: {e}")
+                SEND_FAILURES.inc(account=session_name, error=type(e).__name__)
+                if isinstance(e, errors.FloodWaitError):
+                    FLOOD_WAIT_SECONDS.inc(e.seconds, account=session_name)
+                logging.error(f"❌ ({session_name}) 发送到 {chat_id} {chat_name} 失败: {e}",
+                              extra={"session": session_name, "chat_id": chat_id})
+                if on_progress:
+                    on_progress(chat_id, f"{type(e).__name__}: {e}")
         success_count = len(sent_ids)
         total_count = len(chat_ids)
         return True, f"发送完成: {success_count}/{total_count} 成功。", sent_ids
     except Exception as e:
+        SEND_FAILURES.inc(account=session_name, error=type(e).__name__)
         logging.error(f"❌ ({session_name}) Telegram 客户端操作失败: {e}")
         return False, f"Telegram 客户端操作失败: {e}", []
     finally:
-        if client.is_connected():
-            await client.disconnect()
+        BROADCASTS_IN_PROGRESS.dec()
+        await session.close()
 
 
+@profiled("get_groups")
 async def get_group_ids_and_names(session_name):
-    session_folder = app_path("session")
-    session_file = os.path.join(session_folder, f"{session_name}.session")
-    client = TelegramClient(session_file, API_ID, API_HASH)
+    session = get_backend().open_session(session_name)
     try:
-        await client.start()
-        dialogs = await client.get_dialogs()
-        group_data = [(d.id, d.title) for d in dialogs if d.is_group or d.is_channel]
+        start_time = time.perf_counter()
+        await session.start()
+        group_data = await session.get_groups()
+        DIALOG_FETCH_SECONDS.observe(time.perf_counter() - start_time, account=session_name)
         logging.info(f"✅ ({session_name}) 成功获取 {len(group_data)} 个群组/频道")
         return group_data, None
-    except errors.SessionPasswordNeededError:
-        error_msg = f"账号 '{session_name}' 需要两步验证密码"
+    except NotAuthorizedError as e:
+        error_msg = str(e)
         logging.error(f"❌ {error_msg}")
         return None, error_msg
     except Exception as e:
@@ -51,5 +95,4 @@ async def get_group_ids_and_names(session_name):
         logging.error(f"❌ ({session_name}) {error_msg}")
         return None, error_msg
     finally:
-        if client.is_connected():
-            await client.disconnect()
\ No newline at end of file
+        await session.close()
@@ -1,71 +1,163 @@
 import asyncio
+import importlib
 import os
 import re
 import sys
 import logging
-from datetime import datetime
 
-from PyQt6.QtCore import QTimer
-from PyQt6.QtGui import QIcon
-from PyQt6.QtWidgets import QApplication, QInputDialog, QLineEdit, QStyle
-from telethon import TelegramClient, errors
+from utils import startup_timing
+
+with startup_timing.phase("import PyQt6"):
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtGui import QIcon
+    from PyQt6.QtWidgets import QApplication, QInputDialog, QLineEdit, QStyle
 
-from core.telegram import send_message_to_chats, get_group_ids_and_names
-from core.scheduler import initialize_scheduler, shutdown_scheduler, update_or_create_schedule
-from ui.control_panel import ControlPanel
 from ui.login_window import LoginWindow
 from ui.widgets import LoadingDialog, ResultDialog
-from utils.config import config,load_config, API_ID, API_HASH, DEFAULT_ACCOUNT_CONFIG
-from utils.helpers import resource_path, app_path
-
-# ==== 配置日志 ====
-log_folder = app_path("log")
-if not os.path.exists(log_folder):
-    os.makedirs(log_folder)
-current_date = datetime.now().strftime("%Y-%m-%d")
-log_filename = f"telegram_controller_{current_date}.log"
-log_file = os.path.join(log_folder, log_filename)
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_file, encoding="utf-8"),
-        logging.StreamHandler(),
-    ],
-    force=True
-)
+from utils.config import config,load_config, API_ID, API_HASH, new_account_config, DEFAULT_METRICS_CONFIG
+from utils.diagnostics import enable_diagnostics
+from utils.helpers import resource_path, app_path, list_sessions
+from utils.logging_setup import setup_logging
+from utils.metrics import run_metrics_exporter
+
+# 登录窗口显示后才在后台导入的模块 (Telethon / APScheduler / 控制面板)，按顺序导入
+DEFERRED_IMPORTS = ("telethon", "sqlalchemy", "apscheduler.schedulers.asyncio", "core.scheduler", "core.config_watcher",
+                    "core.health", "core.discovery", "core.control_api")
+
 
 class App:
     def __init__(self, loop):
         self.loop = loop
-        self.current_panel = None
-        self.scheduler = initialize_scheduler(self.loop)
+        self.current_panel = None   # 正在显示的控制面板，关闭后为 None
+        self.control_panel = None   # 所有账号共用的唯一 ControlPanel 实例
+        self.panel_closed = None
+        self.services_ready = None
+        self.background_tasks = []
 
     async def start(self):
-        load_config()
+        with startup_timing.phase("load_config"):
+            load_config()
+        # 先显示登录窗口，较重的模块和调度器在后台准备
+        self.services_ready = self.loop.create_task(self.warm_up())
         while True:
-            login_result = self.show_login_window()
+            login_result = await self.show_login_window()
             if not login_result:
                 logging.info("用户关闭登录窗口，退出应用")
                 break
+            await self.services_ready
             if login_result == '__add_new__':
                 await self.add_new_account_flow()
                 continue
+            if login_result == '__discover__':
+                await self.discover_chats_flow()
+                continue
             session_name = login_result
             await self.run_control_panel(session_name)
             logging.info(f"账号 '{session_name}' 已退出返回账号选择菜单")
 
+        await self.services_ready
+        for task in self.background_tasks:
+            task.cancel()
+        from core.scheduler import shutdown_scheduler
+        from core.discovery import flush_index
+        from core.session_storage import flush_all_sessions
         shutdown_scheduler()
+        flush_all_sessions()
+        await flush_index()
         QApplication.instance().quit()
 
-    def show_login_window(self):
-        dialog = LoginWindow()
-        return dialog.selected_session if dialog.exec() else None
+    async def warm_up(self):
+        """在后台线程中导入 Telethon / APScheduler 等模块，然后启动调度器、配置监视和指标导出"""
+        try:
+            for module_name in DEFERRED_IMPORTS:
+                with startup_timing.phase(f"import {module_name}"):
+                    await self.loop.run_in_executor(None, importlib.import_module, module_name)
+            with startup_timing.phase("import ui.control_panel"):
+                import ui.control_panel  # noqa: F401  (涉及 Qt 控件类，在主线程导入)
+
+            from core.config_watcher import watch_config
+            from core.control_api import run_control_api
+            from core.session_storage import run_session_flusher
+            from core.scheduler import initialize_scheduler, restore_all_schedules
+            with startup_timing.phase("初始化调度器并恢复定时任务"):
+                initialize_scheduler(self.loop)
+                await restore_all_schedules()
+            self.background_tasks = [
+                self.loop.create_task(watch_config(self.on_config_reloaded)),
+                self.loop.create_task(run_metrics_exporter({**DEFAULT_METRICS_CONFIG, **config.get("metrics", {})})),
+                self.loop.create_task(run_session_flusher()),
+                self.loop.create_task(run_control_api(config.get("control_api"))),
+            ]
+            startup_timing.mark("后台初始化完成")
+        except Exception as e:
+            logging.error(f"❌ 后台初始化失败: {e}", exc_info=True)
+        finally:
+            startup_timing.report()
+
+    def on_config_reloaded(self, changed_accounts):
+        if self.current_panel and self.current_panel.session_name in changed_accounts:
+            self.current_panel.reload_account_config()
+
+    def show_dialog(self, dialog):
+        """
+        非阻塞地显示模态窗口，返回在窗口关闭时得到 exec() 结果的 future。
+        不使用 exec()，避免阻塞事件循环，窗口显示期间后台任务照常运行
+        """
+        result_future = self.loop.create_future()
+        # future 持有窗口的引用直到关闭，否则没有 parent 的窗口会被 Python 回收，finished 永远不会触发
+        result_future.dialog = dialog
+        dialog.finished.connect(lambda result: not result_future.done() and result_future.set_result(result))
+        dialog.setModal(True)
+        dialog.show()
+        return result_future
+
+    async def show_login_window(self):
+        with startup_timing.phase("创建登录窗口"):
+            dialog = LoginWindow()
+        result_future = self.show_dialog(dialog)
+        startup_timing.mark("登录窗口已显示")
+        health_task = self.loop.create_task(self.check_accounts_health(dialog))
+        try:
+            return dialog.selected_session if await result_future else None
+        finally:
+            health_task.cancel()
+
+    async def check_accounts_health(self, dialog):
+        """在登录窗口中并发检查所有账号的登录状态 (结果短时间内缓存)"""
+        if not dialog.accounts:
+            return
+        await self.services_ready
+        from core.health import check_accounts
+        await check_accounts(dialog.accounts, on_result=dialog.set_account_status)
+
+    async def discover_chats_flow(self):
+        """并发获取所有账号的群组列表，显示合并去重后的跨账号群组汇总"""
+        from core.discovery import discover_all_chats, get_chat_index
+        from ui.discovery_dialog import DiscoveryDialog
+
+        session_names = list_sessions()
+        if not session_names:
+            ResultDialog.show_message(None, ResultDialog.ResultType.WARNING, "提示", "还没有已保存的账号")
+            return
+        loading_dialog = LoadingDialog()
+        loading_dialog.show_message(f"正在获取 {len(session_names)} 个账号的群组列表...")
+        try:
+            errors = await discover_all_chats(
+                session_names,
+                on_progress=lambda done, total: loading_dialog.show_message(f"正在获取群组列表: 已完成 {done}/{total} 个账号"))
+        finally:
+            loading_dialog.close_dialog()
+        dialog = DiscoveryDialog(get_chat_index(), errors)
+        await self.show_dialog(dialog)
 
     async def add_new_account_flow(self):
         """
         一个完整的、基于 PyQt 弹窗的异步登录流程，并确保只在成功时保存 session
         """
+        from telethon import TelegramClient, errors
+        from core.health import invalidate_health
+        from core.session_storage import create_session
+
         session_name, ok = QInputDialog.getText(None, "第1步：设置别名", "请输入一个账号别名 (只能用英文和数字):")
         if not ok or not session_name: return
         session_name = session_name.strip()
@@ -77,7 +169,7 @@ class App:
         session_folder = app_path("session")
         os.makedirs(session_folder, exist_ok=True)
         session_file = os.path.join(session_folder, f"{session_name}.session")
-        client = TelegramClient(session_file, API_ID, API_HASH)
+        client = TelegramClient(create_session(session_file), API_ID, API_HASH)
         login_success = False
 
         loading_dialog = LoadingDialog()
@@ -107,6 +199,7 @@ class App:
 
             # **关键修复 2：只有在所有步骤都完成后，才标记为成功**
             login_success = True
+            invalidate_health(session_name)
             ResultDialog.show_message(None, ResultDialog.ResultType.SUCCESS, "成功", f"账号 '{session_name}' 登录成功！\n\n请在您的Telegram设备上确认本人操作")
 
         except InterruptedError as e:
@@ -121,6 +214,7 @@ class App:
         finally:
             if client.is_connected():
                 await client.disconnect()
+            client.session.close()
 
             if not login_success and os.path.exists(session_file):
                 try:
@@ -129,46 +223,82 @@ class App:
                 except OSError as e:
                     logging.error(f"❌ 删除不完整的 session 文件失败: {e}")
 
+    def panel_callbacks(self):
+        """ControlPanel 的回调；面板在账号之间复用，所以账号名在调用时从当前面板读取"""
+        from core.scheduler import update_or_create_schedule, update_or_create_schedule_entry
+        return {
+            'on_close'       : lambda: self.panel_closed and not self.panel_closed.done() and self.panel_closed.set_result(True),
+            'get_groups'     : lambda: self.loop.create_task(self.get_groups_task(self.current_panel.session_name)),
+            'send_now'       : lambda ids, text: self.loop.create_task(
+                self.send_now_task(self.current_panel.session_name, ids, text)),
+            'update_schedule': lambda s_name: self.loop.create_task(update_or_create_schedule(s_name)),
+            'update_schedule_entry': lambda s_name, schedule_id: self.loop.create_task(
+                update_or_create_schedule_entry(s_name, schedule_id))
+        }
+
     async def run_control_panel(self, session_name):
+        from core.discovery import chats_for_account
+        from core.scheduler import update_or_create_schedule
+        from ui.control_panel import ControlPanel
         try:
-            closed_future = self.loop.create_future()
-            callbacks = {
-                'on_close'       : lambda: not closed_future.done() and closed_future.set_result(True),
-                'get_groups'     : lambda: self.loop.create_task(self.get_groups_task(session_name)),
-                'send_now'       : lambda ids, text: self.loop.create_task(self.send_now_task(session_name, ids, text)),
-                'update_schedule': lambda s_name: self.loop.create_task(update_or_create_schedule(s_name))
-            }
+            self.panel_closed = self.loop.create_future()
 
             if session_name not in config["accounts"]:
-                config["accounts"][session_name] = DEFAULT_ACCOUNT_CONFIG.copy()
+                config["accounts"][session_name] = new_account_config()
                 # 把这个账号的专属配置提取出来
             account_config_for_panel = config["accounts"][session_name]
 
-            logging.info("即将创建 ControlPanel 实例...")
-            self.current_panel = ControlPanel(session_name, account_config_for_panel, callbacks)
-            logging.info("ControlPanel 实例创建成功！")
+            if self.control_panel is None:
+                logging.info("即将创建 ControlPanel 实例...")
+                self.control_panel = ControlPanel(session_name, account_config_for_panel, self.panel_callbacks())
+                logging.info("ControlPanel 实例创建成功！")
+            else:
+                self.control_panel.load_account(session_name, account_config_for_panel)
+            self.current_panel = self.control_panel
+            # 如果之前 (例如跨账号群组汇总时) 已经获取过这个账号的群组，直接显示，无需再次点击获取
+            known_groups = chats_for_account(session_name)
+            if known_groups:
+                self.current_panel.load_known_groups(known_groups)
             await update_or_create_schedule(session_name)
             self.current_panel.show()
-            await closed_future
+            await self.panel_closed
 
         except Exception as e:
             logging.error(f"创建ControlPanel时发生致命错误: {e}, 错误类型: {type(e).__name__}", exc_info=True)
             ResultDialog.show_message(None, ResultDialog.ResultType.ERROR, "严重错误", f"无法加载主控制面板，请检查日志文件获取详细信息。\n\n错误: {e}")
+        finally:
+            # 返回账号选择时释放这个账号的群组列表和控件，面板本身留给下一个账号使用
+            self.current_panel = None
+            if self.control_panel is not None:
+                self.control_panel.release()
+
+    def is_current_panel(self, session_name):
+        """后台任务完成时面板可能已经关闭或切换到了其他账号"""
+        return self.current_panel is not None and self.current_panel.session_name == session_name
 
     async def get_groups_task(self, session_name):
+        from core.telegram import get_group_ids_and_names
         groups, error = await get_group_ids_and_names(session_name)
-        if self.current_panel:
+        if not error:
+            from core.discovery import update_account_chats
+            update_account_chats(session_name, groups)
+        if self.is_current_panel(session_name):
             self.current_panel.handle_get_groups_result(groups, error)
 
     async def send_now_task(self, session_name, ids, text):
+        from core.telegram import send_message_to_chats
         chat_id_map = {int(k): v for k, v in self.current_panel.account_config["target_chats"].items()}
         success, message, sent_ids = await send_message_to_chats(session_name, ids, text, chat_id_map)
-        if self.current_panel:
+        if self.is_current_panel(session_name):
             self.current_panel.handle_send_now_result(success, message, sent_ids)
 
 # ==== 7. 程序入口 (最终稳定版) ====
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    # ==== 配置日志 ====
+    setup_logging(app_path("log"))
+
+    with startup_timing.phase("创建 QApplication"):
+        app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)
 
     # vvvv---- 新增应用图标设置 ----vvvv
@@ -196,6 +326,10 @@ if __name__ == "__main__":
     timer = QTimer()
     timer.setInterval(20)
     timer.timeout.connect(update_asyncio)
+    # 诊断模式 (TGC_DIAGNOSTICS=1)：驱动 asyncio 的定时器同时作为主线程心跳
+    stall_watchdog = enable_diagnostics(loop, app_path("log"))
+    if stall_watchdog:
+        timer.timeout.connect(stall_watchdog.beat)
     timer.start()
 
     main_app = App(loop)
@@ -24,7 +24,8 @@ a = Analysis(
     pathex=[os.getcwd()],
     binaries=[],
     datas=datas,
-    hiddenimports=[],
+    # main.py 通过 importlib 在后台延迟导入的模块
+    hiddenimports=['telethon', 'sqlalchemy', 'apscheduler.schedulers.asyncio', 'core.scheduler', 'core.config_watcher', 'core.health', 'core.discovery', 'ui.discovery_dialog', 'core.control_api'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
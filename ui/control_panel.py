@@ -6,19 +6,24 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget, QPu
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QIcon
 
+from core.message_template import TEMPLATE_HELP
+from ui.schedule_dialog import ScheduleEditDialog, describe_schedule_entry
 from ui.widgets import ResultDialog, LoadingDialog
-from utils.config import config, save_config
+from utils.config import config, save_config, new_schedule_entry, find_schedule_entry
 
 
 class ControlPanel(QWidget):
+    """
+    账号控制面板。整个程序只创建一个实例：切换账号时用 load_account() 换成新账号的数据，
+    关闭后由 release() 释放群组列表和每行的控件，避免反复切换账号时内存不断增长。
+    """
+
     def __init__(self, session_name, account_config, app_callbacks):
         super().__init__()
-        self.session_name = session_name
+        self.session_name = None
+        self.account_config = None
         self.callbacks = app_callbacks
 
-        self.account_config = account_config
-
-        self.setWindowTitle(f"Telegram 群发控制器 - [{self.session_name}] 🚀")
         self.resize(config.get("window_width"), config.get("window_height"))
 
         self.group_data = []
@@ -27,8 +32,32 @@ class ControlPanel(QWidget):
         self.selected_display = None
 
         self.init_ui()
-        self.load_target_chats_to_listbox()
         self.loading_dialog = LoadingDialog(self)
+        self.load_account(session_name, account_config)
+
+    def load_account(self, session_name, account_config):
+        """显示另一个账号的数据，复用现有的窗口和控件"""
+        self.session_name = session_name
+        self.account_config = account_config
+        self.setWindowTitle(f"Telegram 群发控制器 - [{self.session_name}] 🚀")
+        self.search_entry.clear()
+        self.msg_entry.setPlainText(self.account_config.get("message_text", ""))
+        self.msg_entry.document().setModified(False)
+        self.fetched_group_info = []
+        self.load_target_chats_to_listbox()
+
+    def release(self):
+        """面板关闭后释放账号数据和列表中的控件 (每个群组一行，群组多时占用大量内存)"""
+        self.hide_loading_message()
+        self.group_data = []
+        self.fetched_group_info = []
+        self.list_widget.clear()
+        self.schedule_list.clear()
+        self.selected_display.clear()
+        self.msg_entry.clear()
+        self.search_entry.clear()
+        self.session_name = None
+        self.account_config = None
 
     def init_ui(self):
         main_layout = QVBoxLayout(self)
@@ -75,7 +104,9 @@ class ControlPanel(QWidget):
         main_layout.addLayout(groups_grid)
         bottom_layout = QGridLayout()
         msg_label = QLabel("💬 群发消息")
-        self.msg_entry = QTextEdit(self.account_config.get("message_text", ""))
+        msg_label.setToolTip(TEMPLATE_HELP)
+        self.msg_entry = QTextEdit()
+        self.msg_entry.setToolTip(TEMPLATE_HELP)
         bottom_layout.addWidget(msg_label, 0, 0)
         bottom_layout.addWidget(self.msg_entry, 1, 0)
         schedule_label = QLabel("⚙️ 定时发送")
@@ -91,14 +122,23 @@ class ControlPanel(QWidget):
         self.selected_display.setReadOnly(True)
         self.selected_display.setStyleSheet("background-color: #f0f0f0;")
         settings_layout.addWidget(self.selected_display)
+        self.schedule_list = QListWidget()
+        self.schedule_list.itemChanged.connect(self.on_schedule_item_changed)
+        self.schedule_list.itemDoubleClicked.connect(self.edit_schedule)
+        settings_layout.addWidget(self.schedule_list)
         time_layout = QGridLayout()
-        time_layout.addWidget(QLabel("24小时格式(HH:MM):"), 0, 0)
-        self.time_entry = QLineEdit(f"{self.account_config.get('send_hour', 10):02d}:{self.account_config.get('send_minute', 0):02d}")
-        self.time_entry.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        time_layout.addWidget(self.time_entry, 0, 1)
+        add_schedule_button = QPushButton("➕ 添加")
+        add_schedule_button.clicked.connect(self.add_schedule)
+        time_layout.addWidget(add_schedule_button, 0, 0)
+        edit_schedule_button = QPushButton("✏️ 编辑")
+        edit_schedule_button.clicked.connect(self.edit_schedule)
+        time_layout.addWidget(edit_schedule_button, 0, 1)
+        remove_schedule_button = QPushButton("🗑️ 删除")
+        remove_schedule_button.clicked.connect(self.remove_schedule)
+        time_layout.addWidget(remove_schedule_button, 0, 2)
         save_button = QPushButton("💾 保存配置")
         save_button.clicked.connect(self.save_changes)
-        time_layout.addWidget(save_button, 1, 0, 1, 2)
+        time_layout.addWidget(save_button, 1, 0, 1, 3)
         settings_layout.addLayout(time_layout)
         settings_layout.setStretch(0, 1)
         bottom_layout.addWidget(settings_container, 1, 1)
@@ -122,12 +162,28 @@ class ControlPanel(QWidget):
         self.update_listbox()
         self.update_selected_display()
 
+    def reload_account_config(self):
+        """config.json 被外部修改后，按最新的 account_config 刷新界面 (保留已获取的群组列表)"""
+        # 用户正在编辑、尚未保存的消息不覆盖
+        if not self.msg_entry.document().isModified():
+            self.msg_entry.setPlainText(self.account_config.get("message_text", ""))
+            self.msg_entry.document().setModified(False)
+        target_chats = self.account_config.get("target_chats", {})
+        known_ids = {cid for cid, _, _ in self.group_data}
+        new_data = [(cid, name, "(已保存)" if str(cid) in target_chats else "(新发现)") for cid, name, _ in self.group_data]
+        new_data += [(int(k), v, "(已保存)") for k, v in target_chats.items() if int(k) not in known_ids]
+        self.group_data = sorted(new_data, key=lambda x: (x[2] != "(已保存)", x[1]))
+        self.update_listbox()
+        self.update_selected_display()
+
     def update_selected_display(self):
         """根据当前的 account_config 更新右侧的已选择群组显示"""
         target_chats = self.account_config.get("target_chats", {})
         if self.selected_display:
             display_text = "\n".join(target_chats.values()) if target_chats else "尚未选择任何群组"
             self.selected_display.setText(display_text)
+        # 定时任务摘要里包含目标群组数量，需要一起刷新
+        self.refresh_schedule_list()
 
     def _update_select_all_checkbox_state(self):
         """一个私有的辅助函数，用于更新“全选”复选框的状态"""
@@ -295,16 +351,23 @@ class ControlPanel(QWidget):
         self.show_loading_message("🚀 正在立即发送消息")
         self.callbacks['send_now'](ids, text)
 
-    def handle_get_groups_result(self, groups, error):
-        self.hide_loading_message()
-        if error: ResultDialog.show_message(self, ResultDialog.ResultType.ERROR, "错误", error); return
+    def load_known_groups(self, groups):
+        """用已知的群组列表 (例如跨账号群组汇总中的缓存) 填充列表，不需要重新获取"""
         self.fetched_group_info = groups
         conf_ids = {int(k) for k in self.account_config.get("target_chats", {}).keys()}
         new_data = []
         for cid, cname in self.fetched_group_info:
             new_data.append((cid, cname, "(已保存)" if cid in conf_ids else "(新发现)"))
+        # 已保存但不在列表中的群组也保留
+        fetched_ids = {cid for cid, _ in self.fetched_group_info}
+        new_data += [(cid, name, tag) for cid, name, tag in self.group_data if cid not in fetched_ids and tag == "(已保存)"]
         self.group_data = sorted(new_data, key=lambda x: (x[2] != "(已保存)", x[1]))
         self.update_listbox()
+
+    def handle_get_groups_result(self, groups, error):
+        self.hide_loading_message()
+        if error: ResultDialog.show_message(self, ResultDialog.ResultType.ERROR, "错误", error); return
+        self.load_known_groups(groups)
         ResultDialog.show_message(self, ResultDialog.ResultType.SUCCESS, "获取成功", f"已获取 {len(self.fetched_group_info)} 个群组/频道")
 
     def handle_send_now_result(self, success, message, sent_ids):
@@ -367,18 +430,70 @@ class ControlPanel(QWidget):
 
     def save_changes(self):
         self.account_config["message_text"] = self.msg_entry.toPlainText().strip()
+        self.msg_entry.document().setModified(False)
         try:
-            h, m = map(int, self.time_entry.text().strip().split(":"))
-            if 0 <= h <= 23 and 0 <= m <= 59:
-                self.account_config["send_hour"], self.account_config["send_minute"] = h, m
-                save_config()
-                self.callbacks['update_schedule'](self.session_name)
-                ResultDialog.show_message(self, ResultDialog.ResultType.SUCCESS, "保存成功", "所有配置已保存，定时任务已更新")
-            else:
-                ResultDialog.show_message(self, ResultDialog.ResultType.ERROR, "错误", "时间格式不正确")
+            save_config()
+            self.callbacks['update_schedule'](self.session_name)
+            ResultDialog.show_message(self, ResultDialog.ResultType.SUCCESS, "保存成功", "所有配置已保存，定时任务已更新")
         except Exception as e:
             ResultDialog.show_message(self, ResultDialog.ResultType.ERROR, "错误", f"保存配置失败: {e}")
 
+    def refresh_schedule_list(self):
+        self.schedule_list.blockSignals(True)
+        self.schedule_list.clear()
+        for entry in self.account_config.setdefault("schedules", []):
+            item = QListWidgetItem(describe_schedule_entry(entry, self.account_config), self.schedule_list)
+            item.setData(Qt.ItemDataRole.UserRole, entry["id"])
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked if entry.get("enabled", True) else Qt.CheckState.Unchecked)
+        self.schedule_list.blockSignals(False)
+
+    def _current_schedule_entry(self):
+        item = self.schedule_list.currentItem()
+        return find_schedule_entry(self.account_config, item.data(Qt.ItemDataRole.UserRole)) if item else None
+
+    def _apply_schedule_change(self, schedule_id):
+        """保存配置并只更新这一条定时任务"""
+        save_config()
+        self.refresh_schedule_list()
+        self.callbacks['update_schedule_entry'](self.session_name, schedule_id)
+
+    def on_schedule_item_changed(self, item):
+        """勾选框切换定时任务的启用状态"""
+        entry = find_schedule_entry(self.account_config, item.data(Qt.ItemDataRole.UserRole))
+        if entry is None:
+            return
+        enabled = item.checkState() == Qt.CheckState.Checked
+        if entry.get("enabled", True) != enabled:
+            entry["enabled"] = enabled
+            self._apply_schedule_change(entry["id"])
+
+    def add_schedule(self):
+        dialog = ScheduleEditDialog(new_schedule_entry(), self.account_config.get("target_chats", {}), self)
+        if dialog.exec():
+            self.account_config["schedules"].append(dialog.entry)
+            self._apply_schedule_change(dialog.entry["id"])
+        dialog.deleteLater()
+
+    def edit_schedule(self):
+        entry = self._current_schedule_entry()
+        if entry is None:
+            ResultDialog.show_message(self, ResultDialog.ResultType.WARNING, "提示", "请先选择一个定时任务")
+            return
+        dialog = ScheduleEditDialog(entry, self.account_config.get("target_chats", {}), self)
+        if dialog.exec():
+            entry.update(dialog.entry)
+            self._apply_schedule_change(entry["id"])
+        dialog.deleteLater()
+
+    def remove_schedule(self):
+        entry = self._current_schedule_entry()
+        if entry is None:
+            ResultDialog.show_message(self, ResultDialog.ResultType.WARNING, "提示", "请先选择一个定时任务")
+            return
+        self.account_config["schedules"].remove(entry)
+        self._apply_schedule_change(entry["id"])
+
     def show_loading_message(self, text):
         self.loading_dialog.show_message(text)
 
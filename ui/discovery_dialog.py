@@ -0,0 +1,71 @@
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QLineEdit,
+                             QCheckBox, QLabel, QPushButton, QHeaderView)
+from PyQt6.QtCore import Qt
+
+
+class DiscoveryDialog(QDialog):
+    """显示跨账号群组汇总：每个群组可以被哪些账号访问"""
+
+    def __init__(self, chat_index, errors=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("跨账号群组汇总")
+        self.resize(800, 600)
+        self.chat_index = chat_index
+
+        layout = QVBoxLayout(self)
+        exclusive_count = sum(1 for entry in chat_index.values() if len(entry["accounts"]) == 1)
+        summary = f"共 {len(chat_index)} 个群组/频道，其中 {exclusive_count} 个只有一个账号可访问"
+        if errors:
+            summary += f"\n⚠️ {len(errors)} 个账号获取失败: " + "，".join(errors)
+        layout.addWidget(QLabel(summary))
+
+        filter_layout = QHBoxLayout()
+        self.search_entry = QLineEdit()
+        self.search_entry.setPlaceholderText("按群聊名称或账号搜索")
+        self.search_entry.returnPressed.connect(self.update_table)
+        filter_layout.addWidget(self.search_entry, 1)
+        self.exclusive_checkbox = QCheckBox("只显示单账号可达")
+        self.exclusive_checkbox.stateChanged.connect(self.update_table)
+        filter_layout.addWidget(self.exclusive_checkbox)
+        search_button = QPushButton("🔍 搜索")
+        search_button.clicked.connect(self.update_table)
+        filter_layout.addWidget(search_button)
+        layout.addLayout(filter_layout)
+
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["群组/频道", "ID", "账号数", "可访问的账号"])
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        close_button = QPushButton("关闭")
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button)
+
+        self.update_table()
+
+    def update_table(self):
+        query = self.search_entry.text().lower().strip()
+        only_exclusive = self.exclusive_checkbox.isChecked()
+        rows = []
+        for cid, entry in self.chat_index.items():
+            accounts = entry["accounts"]
+            if only_exclusive and len(accounts) != 1:
+                continue
+            if query and query not in entry["title"].lower() and not any(query in a.lower() for a in accounts):
+                continue
+            rows.append((entry["title"], cid, accounts))
+
+        self.table.setSortingEnabled(False)
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(rows))
+        for row, (title, cid, accounts) in enumerate(rows):
+            count_item = QTableWidgetItem()
+            count_item.setData(Qt.ItemDataRole.DisplayRole, len(accounts))
+            self.table.setItem(row, 0, QTableWidgetItem(title))
+            self.table.setItem(row, 1, QTableWidgetItem(str(cid)))
+            self.table.setItem(row, 2, count_item)
+            self.table.setItem(row, 3, QTableWidgetItem(", ".join(accounts)))
+        self.table.setUpdatesEnabled(True)
+        self.table.setSortingEnabled(True)
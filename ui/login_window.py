@@ -1,10 +1,8 @@
-import os
-from glob import glob
-
-from PyQt6.QtWidgets import (QVBoxLayout, QHBoxLayout, QListWidget,
+from PyQt6.QtWidgets import (QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem,
                              QPushButton, QLabel, QDialog)
+from PyQt6.QtCore import Qt
 
-from utils.helpers import app_path
+from utils.helpers import list_sessions
 
 
 class LoginWindow(QDialog):
@@ -24,24 +22,40 @@ class LoginWindow(QDialog):
         button_layout.addWidget(self.login_button)
         button_layout.addWidget(self.add_button)
         layout.addLayout(button_layout)
+        self.discover_button = QPushButton("🌐 跨账号群组汇总")
+        layout.addWidget(self.discover_button)
 
         self.login_button.clicked.connect(self.on_login)
         self.add_button.clicked.connect(self.on_add)
+        self.discover_button.clicked.connect(self.on_discover)
         self.list_widget.itemDoubleClicked.connect(self.on_login)
 
-        session_folder = app_path("session")
-        self.accounts = [os.path.splitext(os.path.basename(f))[0] for f in glob(f"{session_folder}/*.session")]
+        self.accounts = list_sessions()
+        self.account_items = {}
         if not self.accounts:
             self.list_widget.addItem("未检测到任何账号")
             self.list_widget.setEnabled(False)
             self.login_button.setEnabled(False)
+            self.discover_button.setEnabled(False)
         else:
-            self.list_widget.addItems(self.accounts)
+            for name in self.accounts:
+                item = QListWidgetItem(f"{name}    ⏳ 检查中...", self.list_widget)
+                item.setData(Qt.ItemDataRole.UserRole, name)
+                self.account_items[name] = item
+
+    def set_account_status(self, session_name, health):
+        """显示账号状态检查结果，health 为 core.health 返回的字典"""
+        item = self.account_items.get(session_name)
+        if item is None:
+            return
+        status_text = {"authorized": "✅ 已登录", "expired": "⚠️ 已失效"}.get(health["status"], "❌ 出错")
+        item.setText(f"{session_name}    {status_text} ({health['latency'] * 1000:.0f} ms)")
+        item.setToolTip(health["detail"] or status_text)
 
     def on_login(self):
         current_item = self.list_widget.currentItem()
-        if current_item:
-            self.selected_session = current_item.text()
+        if current_item and current_item.data(Qt.ItemDataRole.UserRole):
+            self.selected_session = current_item.data(Qt.ItemDataRole.UserRole)
             self.accept()
 
     def on_add(self):
@@ -49,3 +63,8 @@ class LoginWindow(QDialog):
         self.hide()
         self.selected_session = "__add_new__"
         self.accept()
+
+    def on_discover(self):
+        self.hide()
+        self.selected_session = "__discover__"
+        self.accept()
@@ -0,0 +1,101 @@
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QCheckBox, QComboBox,
+                             QLineEdit, QSpinBox, QTextEdit, QListWidget, QListWidgetItem, QPushButton, QLabel)
+from PyQt6.QtCore import Qt
+
+from core.scheduler import build_trigger
+from ui.widgets import ResultDialog
+
+
+def describe_schedule_entry(entry, account_config):
+    """生成定时任务在列表中显示的一行摘要"""
+    if entry.get("trigger") == "interval":
+        when = f"每 {entry.get('interval_minutes')} 分钟"
+    else:
+        when = f"cron: {entry.get('cron')}"
+    target_ids = entry.get("target_ids", [])
+    targets = f"{len(target_ids)} 个群组" if target_ids else f"全部群组({len(account_config.get('target_chats', {}))})"
+    message = "自定义消息" if entry.get("message_text") else "默认消息"
+    return f"{when} | {targets} | {message}"
+
+
+class ScheduleEditDialog(QDialog):
+    """新增 / 编辑单条定时任务的弹窗"""
+
+    def __init__(self, entry, target_chats, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("编辑定时任务")
+        self.setMinimumSize(420, 480)
+        self.entry = dict(entry)
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+
+        self.enabled_checkbox = QCheckBox("启用")
+        self.enabled_checkbox.setChecked(self.entry.get("enabled", True))
+        form.addRow("状态:", self.enabled_checkbox)
+
+        self.trigger_combo = QComboBox()
+        self.trigger_combo.addItem("Cron 表达式", "cron")
+        self.trigger_combo.addItem("固定间隔", "interval")
+        self.trigger_combo.setCurrentIndex(1 if self.entry.get("trigger") == "interval" else 0)
+        self.trigger_combo.currentIndexChanged.connect(self._update_trigger_inputs)
+        form.addRow("触发方式:", self.trigger_combo)
+
+        self.cron_entry = QLineEdit(self.entry.get("cron", ""))
+        self.cron_entry.setPlaceholderText("分 时 日 月 周，例如 23 12 * * *")
+        form.addRow("Cron:", self.cron_entry)
+
+        self.interval_spin = QSpinBox()
+        self.interval_spin.setRange(1, 7 * 24 * 60)
+        self.interval_spin.setSuffix(" 分钟")
+        self.interval_spin.setValue(int(self.entry.get("interval_minutes", 60)))
+        form.addRow("间隔:", self.interval_spin)
+        layout.addLayout(form)
+
+        layout.addWidget(QLabel("💬 消息 (留空则使用账号的群发消息):"))
+        self.msg_entry = QTextEdit(self.entry.get("message_text", ""))
+        layout.addWidget(self.msg_entry)
+
+        layout.addWidget(QLabel("📋 发送目标 (不勾选则发送到全部已保存群组):"))
+        self.target_list = QListWidget()
+        selected = {str(k) for k in self.entry.get("target_ids", [])}
+        for cid_str, cname in target_chats.items():
+            item = QListWidgetItem(cname, self.target_list)
+            item.setData(Qt.ItemDataRole.UserRole, cid_str)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked if cid_str in selected else Qt.CheckState.Unchecked)
+        layout.addWidget(self.target_list)
+
+        button_layout = QHBoxLayout()
+        ok_button = QPushButton("💾 保存")
+        cancel_button = QPushButton("取消")
+        ok_button.clicked.connect(self.on_ok)
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(ok_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+
+        self._update_trigger_inputs()
+
+    def _update_trigger_inputs(self):
+        is_interval = self.trigger_combo.currentData() == "interval"
+        self.cron_entry.setEnabled(not is_interval)
+        self.interval_spin.setEnabled(is_interval)
+
+    def on_ok(self):
+        self.entry["enabled"] = self.enabled_checkbox.isChecked()
+        self.entry["trigger"] = self.trigger_combo.currentData()
+        self.entry["cron"] = " ".join(self.cron_entry.text().split())
+        self.entry["interval_minutes"] = self.interval_spin.value()
+        self.entry["message_text"] = self.msg_entry.toPlainText().strip()
+        self.entry["target_ids"] = [
+            self.target_list.item(i).data(Qt.ItemDataRole.UserRole)
+            for i in range(self.target_list.count())
+            if self.target_list.item(i).checkState() == Qt.CheckState.Checked
+        ]
+        try:
+            build_trigger(self.entry)
+        except ValueError as e:
+            ResultDialog.show_message(self, ResultDialog.ResultType.ERROR, "错误", f"触发时间不合法: {e}")
+            return
+        self.accept()
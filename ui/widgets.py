@@ -199,6 +199,8 @@ class ResultDialog(QDialog):
     def show_message(parent: QWidget | None, dialog_type: "ResultDialog.ResultType", title: str, message: str):
         """静态方法，用于像 QMessageBox一样方便地显示对话框"""
         dialog = ResultDialog(dialog_type, title, message, parent)
+        # 关闭后删除，否则每个弹窗都会作为 parent 的子控件一直留在内存中
+        dialog.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
         dialog.adjustSize()
         # 将对话框居中于父窗口
         if parent:
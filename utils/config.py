@@ -1,46 +1,192 @@
+import copy
 import json
 import logging
 import os
+import uuid
 
 from utils.helpers import app_path
+from utils.metrics import CONFIG_SAVE_SECONDS
 
 # ==== 全局常量和配置 ====
 API_ID = 17349
 API_HASH = "344583e45741c457fe1862106095a5eb"
 CONFIG_FILE = app_path("config.json")
-DEFAULT_ACCOUNT_CONFIG = {"target_chats": {}, "message_text": "这是自动群发的消息 ✅", "send_hour": 12, "send_minute": 23}
-DEFAULT_CONFIG = {"accounts": {}, "window_width": 750, "window_height": 700}
+JOBSTORE_FILE = app_path("jobs.sqlite")
+DEFAULT_ACCOUNT_CONFIG = {"target_chats": {}, "message_text": "这是自动群发的消息 ✅", "schedules": []}
+# 单条定时任务: trigger 为 "cron" 或 "interval"; message_text 为空时使用账号消息; target_ids 为空时发送到账号全部已保存群组
+DEFAULT_SCHEDULE_ENTRY = {"id": "", "enabled": True, "trigger": "cron", "cron": "23 12 * * *", "interval_minutes": 60,
+                          "message_text": "", "target_ids": []}
+# misfire_grace_seconds: 错过触发时间后多久内仍然补发 (null 表示不限); coalesce: 错过多次时只补发一次
+# stagger_window_seconds: 按账号名固定错开的时间窗口; jitter_seconds: 额外随机延后的最大秒数
+# max_concurrent_sends: 同时执行的定时群发数量上限
+DEFAULT_SCHEDULER_CONFIG = {"misfire_grace_seconds": 3600, "coalesce": True,
+                            "stagger_window_seconds": 300, "jitter_seconds": 30, "max_concurrent_sends": 3}
+# http_port: 在 host 上提供 Prometheus 文本格式的 /metrics 接口 (null 为关闭); file: 定期写入指标的文件路径 (null 为关闭)
+DEFAULT_METRICS_CONFIG = {"host": "127.0.0.1", "http_port": None, "file": None, "file_interval_seconds": 15}
+# type: "sqlite" (默认) 为 Telethon 默认的直接写入 .session 文件；"buffered" 为内存缓存、定期写回，
+#       磁盘写入更少，但程序崩溃时可能丢失最近 flush_interval_seconds 秒内的实体缓存等数据
+# flush_interval_seconds: buffered 模式下写回磁盘的最短间隔
+DEFAULT_SESSION_STORAGE_CONFIG = {"type": "sqlite", "flush_interval_seconds": 30}
+# 本地控制接口: port 不为空时在 host:port 提供 HTTP 接口; unix_socket 不为空时同时监听该 Unix socket (仅 Linux / macOS)
+# token: 必填，请求需要带 "Authorization: Bearer <token>"；为空时控制接口不会启动
+DEFAULT_CONTROL_API_CONFIG = {"host": "127.0.0.1", "port": None, "unix_socket": None, "token": None}
+DEFAULT_CONFIG = {"accounts": {}, "window_width": 750, "window_height": 700, "scheduler": DEFAULT_SCHEDULER_CONFIG,
+                  "metrics": DEFAULT_METRICS_CONFIG, "session_storage": DEFAULT_SESSION_STORAGE_CONFIG,
+                  "control_api": DEFAULT_CONTROL_API_CONFIG}
 
 # config 字典
 config = {}
 
+# ==== 账号 / 定时任务配置 ====
+def new_schedule_entry(**overrides):
+    """创建一条新的定时任务配置，自动生成唯一 id"""
+    entry = copy.deepcopy(DEFAULT_SCHEDULE_ENTRY)
+    entry.update(overrides)
+    if not entry["id"]:
+        entry["id"] = uuid.uuid4().hex[:8]
+    return entry
+
+
+def new_account_config():
+    """创建新账号的默认配置 (深拷贝，避免多个账号共用同一个 target_chats 字典)"""
+    account_config = copy.deepcopy(DEFAULT_ACCOUNT_CONFIG)
+    account_config["schedules"].append(new_schedule_entry())
+    return account_config
+
+
+def migrate_account_config(account_config):
+    """把旧版的 send_hour / send_minute 单一定时配置迁移为 schedules 列表"""
+    if "schedules" in account_config:
+        return
+    hour = account_config.pop("send_hour", 12)
+    minute = account_config.pop("send_minute", 23)
+    # 固定 id，保证同一份旧配置每次迁移结果一致 (热加载对比时不会误判为修改)
+    account_config["schedules"] = [new_schedule_entry(id="daily", cron=f"{minute} {hour} * * *")]
+
+
+def find_schedule_entry(account_config, schedule_id):
+    for entry in (account_config or {}).get("schedules", []):
+        if entry.get("id") == schedule_id:
+            return entry
+    return None
+
+
 # ==== 读写配置 ====
-def load_config():
+# 最近一次与磁盘同步时的配置内容和文件签名，用于检测外部修改并做三方合并
+_disk_snapshot = {}
+_disk_signature = None
+# save_config 时顺带合并进来的外部修改，等待下一次 reload_config_if_changed 交给调用方重新调度
+_unhandled_changes = set()
+_MISSING = object()
+
+
+def _file_signature():
     try:
-        loaded_data = DEFAULT_CONFIG.copy()
+        stat = os.stat(CONFIG_FILE)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def _read_config_file():
+    loaded_data = copy.deepcopy(DEFAULT_CONFIG)
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            file_content = f.read().strip()
+            if file_content:
+                loaded_data.update(json.loads(file_content))
+
+    for account_config in loaded_data.get("accounts", {}).values():
+        migrate_account_config(account_config)
+    return loaded_data
 
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                file_content = f.read().strip()
-                if file_content:
-                    loaded_data.update(json.loads(file_content))
+
+def _mark_synced(signature):
+    global _disk_snapshot, _disk_signature
+    _disk_snapshot = copy.deepcopy(config)
+    _disk_signature = signature
+
+
+def load_config():
+    try:
+        signature = _file_signature()
+        loaded_data = _read_config_file()
 
         # 清空当前的 config 字典，并用加载好的数据填充它
         config.clear()
         config.update(loaded_data)
+        _mark_synced(signature)
 
         logging.info("✅ config.json 已加载")
 
     except Exception as e:
         config.clear()
-        config.update(DEFAULT_CONFIG.copy())
+        config.update(copy.deepcopy(DEFAULT_CONFIG))
         logging.error(f"❌ 加载 config.json 时发生错误: {e}")
 
 
+def _merge_dict(base, local, external, path=""):
+    """
+    三方合并：只有外部修改过的字段才会写入 local (原地修改，保持字典引用不变)。
+    同一个字段本地和外部都改过时，以外部文件为准并记录警告。
+    """
+    for key in set(local) | set(external):
+        b, l, e = base.get(key, _MISSING), local.get(key, _MISSING), external.get(key, _MISSING)
+        if e == b or l == e:
+            continue
+        if isinstance(l, dict) and isinstance(e, dict):
+            _merge_dict(b if isinstance(b, dict) else {}, l, e, f"{path}{key}.")
+            continue
+        if l != b:
+            logging.warning(f"⚠️ 配置项 {path}{key} 在程序内和 config.json 中都被修改，以 config.json 为准")
+        if e is _MISSING:
+            del local[key]
+        else:
+            local[key] = copy.deepcopy(e)
+
+
+def reload_config_if_changed():
+    """
+    如果 config.json 被外部修改，把外部修改合并进当前 config，并返回内容发生变化的账号名集合。
+    """
+    global _disk_snapshot, _disk_signature
+    changed = set(_unhandled_changes)
+    _unhandled_changes.clear()
+    signature = _file_signature()
+    if signature == _disk_signature:
+        return changed
+    try:
+        external = _read_config_file()
+    except Exception as e:
+        # 可能是外部工具还没写完，下次检测时再试
+        logging.error(f"❌ 重新加载 config.json 失败: {e}")
+        return changed
+
+    old_accounts = copy.deepcopy(config.get("accounts", {}))
+    old_scheduler = copy.deepcopy(config.get("scheduler"))
+    _merge_dict(_disk_snapshot, config, external)
+    _disk_snapshot = external
+    _disk_signature = signature
+
+    accounts = config.get("accounts", {})
+    if config.get("scheduler") != old_scheduler:
+        # 全局调度参数变了，所有账号都需要重新对账
+        changed |= set(accounts) | set(old_accounts)
+    else:
+        changed |= {name for name in set(accounts) | set(old_accounts) if accounts.get(name) != old_accounts.get(name)}
+    logging.info(f"✅ 检测到 config.json 外部修改，已重新加载 ({len(changed)} 个账号有变化)")
+    return changed
+
+
 def save_config():
     try:
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(config, f, ensure_ascii=False, indent=4)
+        # 先合并磁盘上的外部修改，避免被本次保存覆盖
+        if _file_signature() != _disk_signature:
+            _unhandled_changes.update(reload_config_if_changed())
+        with CONFIG_SAVE_SECONDS.time():
+            with open(CONFIG_FILE, "w", encoding="utf-8") as f:
+                json.dump(config, f, ensure_ascii=False, indent=4)
+        _mark_synced(_file_signature())
         logging.info("✅ 配置已保存")
     except Exception as e:
-        logging.error(f"❌ 保存配置时发生错误: {e}")
\ No newline at end of file
+        logging.error(f"❌ 保存配置时发生错误: {e}")
@@ -0,0 +1,200 @@
+"""
+可选的诊断模式，默认全部关闭:
+
+- TGC_DIAGNOSTICS=1: 记录超过阈值的 asyncio 慢回调，以及主线程 (Qt 事件循环) 卡顿时的调用栈采样
+- TGC_STALL_THRESHOLD_MS: 卡顿阈值，默认 200 毫秒
+- TGC_PROFILE=cprofile 或 sampling: 对每次群发 / 获取群组列表做性能分析，报告保存在 log/profiles/
+"""
+import cProfile
+import functools
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from utils.helpers import app_path
+
+DEFAULT_STALL_THRESHOLD_MS = 200
+
+
+def _parse_stall_threshold():
+    """读取 TGC_STALL_THRESHOLD_MS，返回 (阈值秒数, 警告信息或 None)；值不合法时使用默认的 200 ms"""
+    raw = os.environ.get("TGC_STALL_THRESHOLD_MS")
+    if raw is None:
+        return DEFAULT_STALL_THRESHOLD_MS / 1000, None
+    try:
+        value = float(raw)
+        if not 0 < value < float("inf"):
+            raise ValueError(raw)
+        return value / 1000, None
+    except ValueError:
+        return DEFAULT_STALL_THRESHOLD_MS / 1000, \
+            f"⚠️ TGC_STALL_THRESHOLD_MS={raw!r} 不是有效的毫秒数，使用默认值 {DEFAULT_STALL_THRESHOLD_MS} ms"
+
+
+ENABLED = os.environ.get("TGC_DIAGNOSTICS") == "1"
+# 在导入时解析，此时日志尚未配置，警告留到 enable_diagnostics() 中输出
+STALL_THRESHOLD, _STALL_THRESHOLD_WARNING = _parse_stall_threshold()
+PROFILE_MODE = os.environ.get("TGC_PROFILE", "").lower()
+SAMPLE_INTERVAL = 0.005
+
+_report_folder = app_path("log")
+_profiling = False
+
+
+def _stack_key(frame):
+    """把调用栈转换成 "文件:函数:行号" 组成的元组，最外层在前"""
+    return tuple(f"{os.path.basename(f.filename)}:{f.name}:{f.lineno}" for f in traceback.extract_stack(frame))
+
+
+class StallWatchdog(threading.Thread):
+    """
+    后台线程：主线程每次处理 asyncio 定时器时调用 beat()，
+    超过阈值没有心跳时认为主线程卡住了，期间持续采样主线程的调用栈。
+    """
+
+    def __init__(self, threshold=STALL_THRESHOLD):
+        super().__init__(name="StallWatchdog", daemon=True)
+        self.threshold = threshold
+        self.main_thread_id = threading.main_thread().ident
+        self.last_beat = None  # 第一次心跳之后才开始检测
+        self._stop_event = threading.Event()
+
+    def beat(self):
+        self.last_beat = time.perf_counter()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        stall_start = None
+        samples = Counter()
+        while not self._stop_event.wait(min(self.threshold / 4, 0.05)):
+            last_beat = self.last_beat
+            if last_beat is None:
+                continue
+            if time.perf_counter() - last_beat >= self.threshold:
+                if stall_start is None or last_beat > stall_start:
+                    if stall_start is not None:
+                        self._report(stall_start, samples)
+                    stall_start, samples = last_beat, Counter()
+                frame = sys._current_frames().get(self.main_thread_id)
+                if frame is not None:
+                    samples[_stack_key(frame)] += 1
+            elif stall_start is not None:
+                self._report(stall_start, samples, self.last_beat)
+                stall_start = None
+
+    def _report(self, stall_start, samples, stall_end=None):
+        duration = ((stall_end or time.perf_counter()) - stall_start) * 1000
+        lines = [f"⚠️ 主线程卡顿 {duration:.0f} ms，调用栈采样 {sum(samples.values())} 次:"]
+        for stack, count in samples.most_common(3):
+            lines.append(f"  -- {count} 次:")
+            lines.extend(f"    {entry}" for entry in stack[-15:])
+        logging.warning("\n".join(lines))
+
+
+class SamplingProfiler(threading.Thread):
+    """定时采样指定线程的调用栈，输出 collapsed 格式 (可用 flamegraph.pl / speedscope 查看)"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(name="SamplingProfiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_stack_key(frame)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def enable_diagnostics(loop, report_folder=None):
+    """
+    按环境变量开启诊断。返回 StallWatchdog (需要把它的 beat 连接到驱动 asyncio 的 QTimer 上)，未开启时返回 None。
+    """
+    global _report_folder
+    if report_folder:
+        _report_folder = report_folder
+    if _STALL_THRESHOLD_WARNING:
+        logging.warning(_STALL_THRESHOLD_WARNING)
+    if not ENABLED:
+        return None
+    loop.set_debug(True)
+    loop.slow_callback_duration = STALL_THRESHOLD
+    logging.getLogger("asyncio").setLevel(logging.WARNING)
+    watchdog = StallWatchdog()
+    watchdog.start()
+    logging.info(f"🩺 诊断模式已开启，卡顿阈值 {STALL_THRESHOLD * 1000:.0f} ms")
+    return watchdog
+
+
+def _report_path(name, extension):
+    folder = os.path.join(_report_folder, "profiles")
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}")
+
+
+@asynccontextmanager
+async def profile_section(name):
+    """
+    对一段异步代码做性能分析 (TGC_PROFILE 未设置时不做任何事)。
+    同一时间只分析一段；期间事件循环上运行的其他任务也会被统计进去。
+    """
+    global _profiling
+    if PROFILE_MODE not in ("cprofile", "sampling") or _profiling:
+        yield
+        return
+
+    _profiling = True
+    start = time.perf_counter()
+    try:
+        if PROFILE_MODE == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                path = _report_path(name, "prof")
+                profiler.dump_stats(path)
+                with open(f"{path}.txt", "w", encoding="utf-8") as f:
+                    pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(50)
+        else:
+            sampler = SamplingProfiler(threading.get_ident())
+            sampler.start()
+            try:
+                yield
+            finally:
+                sampler.stop()
+                path = _report_path(name, "collapsed")
+                with open(path, "w", encoding="utf-8") as f:
+                    for stack, count in sampler.samples.most_common():
+                        f.write(f"{';'.join(stack)} {count}\n")
+        logging.info(f"🩺 性能分析 '{name}' 完成 ({(time.perf_counter() - start) * 1000:.0f} ms)，报告: {path}")
+    finally:
+        _profiling = False
+
+
+def profiled(name):
+    """装饰异步函数，按 "名称_账号名" 做性能分析 (第一个参数为账号名)"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            section = f"{name}_{args[0]}" if args else name
+            async with profile_section(section):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
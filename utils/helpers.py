@@ -1,5 +1,6 @@
 import os
 import sys
+from glob import glob
 
 
 def resource_path(relative_path):
@@ -26,4 +27,9 @@ def app_path(relative_path=""):
         # 在我们的项目结构中，helpers.py 在 utils/ 里，所以需要返回上一级
         application_path = os.path.join(application_path, '..')
 
-    return os.path.join(application_path, relative_path)
\ No newline at end of file
+    return os.path.join(application_path, relative_path)
+
+def list_sessions():
+    """返回 session 目录下所有已保存账号的名称"""
+    session_folder = app_path("session")
+    return [os.path.splitext(os.path.basename(f))[0] for f in glob(f"{session_folder}/*.session")]
@@ -0,0 +1,141 @@
+import atexit
+import glob
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from datetime import datetime, timedelta
+
+LOG_BASENAME = "telegram_controller.log"
+LOG_MAX_BYTES = 20 * 1024 * 1024   # 单个日志文件超过该大小时轮转
+LOG_BACKUP_COUNT = 30              # 最多保留的历史日志文件数
+LOG_RETENTION_DAYS = 30            # 历史日志最长保留天数
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# 结构化日志中额外输出的字段，通过 logging.info(..., extra={"session": ..., "chat_id": ..., "latency_ms": ...}) 传入
+STRUCTURED_FIELDS = ("session", "chat_id", "latency_ms")
+
+_listener = None
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.BaseRotatingHandler):
+    """每天零点或文件超过 max_bytes 时轮转，并按数量和天数清理历史文件"""
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                 retention_days=LOG_RETENTION_DAYS, encoding="utf-8"):
+        super().__init__(filename, "a", encoding=encoding, delay=False)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.retention_days = retention_days
+        # 按已有日志文件的最后修改时间计算，隔天启动时第一条日志就会先轮转昨天的文件
+        last_write = os.path.getmtime(self.baseFilename) if os.path.exists(self.baseFilename) else None
+        self.rollover_at = self._next_midnight(last_write)
+        self._delete_old_files()
+
+    @staticmethod
+    def _next_midnight(timestamp=None):
+        day = datetime.fromtimestamp(timestamp).date() if timestamp else datetime.now().date()
+        return datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp()
+
+    def shouldRollover(self, record):
+        if time.time() >= self.rollover_at:
+            return True
+        if self.max_bytes and self.stream is not None:
+            self.stream.seek(0, 2)
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        suffix = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        target = f"{self.baseFilename}.{suffix}"
+        counter = 1
+        while os.path.exists(target):
+            target = f"{self.baseFilename}.{suffix}.{counter}"
+            counter += 1
+        if os.path.exists(self.baseFilename):
+            self.rotate(self.baseFilename, target)
+        self._delete_old_files()
+        self.rollover_at = self._next_midnight()
+        self.stream = self._open()
+
+    def _legacy_files(self):
+        """旧版本按日期命名的日志文件 (telegram_controller_YYYY-MM-DD.log)，按同样的规则清理"""
+        stem, ext = os.path.splitext(self.baseFilename)
+        return glob.glob(f"{glob.escape(stem)}_????-??-??{glob.escape(ext)}")
+
+    def _delete_old_files(self):
+        rotated = sorted(glob.glob(f"{glob.escape(self.baseFilename)}.*") + self._legacy_files(), key=os.path.getmtime)
+        expire_before = time.time() - self.retention_days * 86400 if self.retention_days else None
+        excess = len(rotated) - self.backup_count if self.backup_count else 0
+        for i, path in enumerate(rotated):
+            if i < excess or (expire_before and os.path.getmtime(path) < expire_before):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志输出一行 JSON，便于机器分析"""
+
+    def format(self, record):
+        data = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    队列只在本进程内使用，不需要序列化记录：调用线程只合并 msg 和 args，
+    时间格式化、异常堆栈和文件写入全部交给后台线程。
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(log_folder, json_format=None):
+    """
+    配置日志：调用方只把日志放入队列，由后台线程写入文件和控制台。
+    json_format 为 None 时根据环境变量 TGC_LOG_JSON=1 决定是否输出 JSON Lines。
+    """
+    global _listener
+    if json_format is None:
+        json_format = os.environ.get("TGC_LOG_JSON") == "1"
+    os.makedirs(log_folder, exist_ok=True)
+
+    file_handler = SizeAndTimeRotatingFileHandler(os.path.join(log_folder, LOG_BASENAME))
+    file_handler.setFormatter(JsonLinesFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    if _listener:
+        _listener.stop()
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    logging.basicConfig(level=logging.INFO, handlers=[_InProcessQueueHandler(log_queue)], force=True)
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """把队列中剩余的日志写完后停止后台线程"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
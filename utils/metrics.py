@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import math
+import os
+import time
+
+# 所有指标只在事件循环线程中更新和导出，因此不加锁
+_registry = []
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        counts = state[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def time(self, **labels):
+        """with HISTOGRAM.time(account=...): 统计代码块耗时"""
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+# ==== 指标定义 ====
+MESSAGES_SENT = Counter("tgc_messages_sent_total", "成功发送的消息数", ["account"])
+SEND_FAILURES = Counter("tgc_send_failures_total", "发送失败次数 (按错误类型)", ["account", "error"])
+FLOOD_WAIT_SECONDS = Counter("tgc_flood_wait_seconds_total", "Telegram 要求等待 (FloodWait) 的累计秒数", ["account"])
+SEND_LATENCY = Histogram("tgc_send_latency_seconds", "单条消息发送耗时", ["account"])
+BROADCASTS_IN_PROGRESS = Gauge("tgc_broadcasts_in_progress", "正在进行的群发数量")
+DIALOG_FETCH_SECONDS = Histogram("tgc_dialog_fetch_seconds", "获取群组列表耗时", ["account"])
+SCHEDULER_LAG_SECONDS = Histogram("tgc_scheduler_lag_seconds", "定时任务提交执行的时间与计划时间之差",
+                                  buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600))
+SCHEDULER_QUEUED_SECONDS = Histogram("tgc_scheduler_queued_seconds",
+                                     "定时群发因 max_concurrent_sends 上限排队等待的时间",
+                                     buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600))
+SCHEDULER_MISSED = Counter("tgc_scheduler_missed_total", "超过补发宽限时间而被跳过的定时任务次数")
+SCHEDULED_JOBS = Gauge("tgc_scheduled_jobs", "已注册的定时任务数量")
+CONFIG_SAVE_SECONDS = Histogram("tgc_config_save_seconds", "保存 config.json 耗时")
+SESSION_FLUSH_SECONDS = Histogram("tgc_session_flush_seconds", "把内存中的 session 写回 .session 文件的耗时")
+
+
+def render_prometheus():
+    """按 Prometheus 文本格式导出所有指标"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ==== 导出 ====
+def _http_response(status, content_type, body, extra_headers=""):
+    header = (f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n{extra_headers}"
+              f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+    return header.encode("ascii") + body
+
+
+async def _handle_http(reader, writer):
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+        request_line = head.split(b"\r\n", 1)[0].decode("iso-8859-1")
+        method, target = (request_line.split(" ") + ["", ""])[:2]
+        path = target.split("?", 1)[0]
+        if path != "/metrics":
+            response = _http_response("404 Not Found", "text/plain; charset=utf-8", b"not found\n")
+        elif method != "GET":
+            response = _http_response("405 Method Not Allowed", "text/plain; charset=utf-8",
+                                      b"method not allowed\n", "Allow: GET\r\n")
+        else:
+            response = _http_response("200 OK", "text/plain; version=0.0.4; charset=utf-8",
+                                      render_prometheus().encode("utf-8"))
+        writer.write(response)
+        await writer.drain()
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def _write_metrics_file(path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+async def run_metrics_exporter(metrics_config):
+    """
+    按配置导出指标：http_port 不为空时在 host:http_port 提供 /metrics 文本接口；
+    file 不为空时每隔 file_interval_seconds 秒原子地写入该文件。
+    """
+    server = None
+    try:
+        if metrics_config.get("http_port"):
+            host = metrics_config.get("host", "127.0.0.1")
+            server = await asyncio.start_server(_handle_http, host, metrics_config["http_port"])
+            logging.info(f"📈 指标接口已启动: http://{host}:{metrics_config['http_port']}/metrics")
+        path = metrics_config.get("file")
+        if not path:
+            if server:
+                await server.serve_forever()
+            return
+        while True:
+            await asyncio.sleep(metrics_config.get("file_interval_seconds", 15))
+            try:
+                _write_metrics_file(path)
+            except OSError as e:
+                logging.error(f"❌ 写入指标文件失败: {e}")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logging.error(f"❌ 启动指标导出失败: {e}")
+    finally:
+        if server:
+            server.close()
@@ -0,0 +1,42 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 设置环境变量 TGC_STARTUP_TIMING=1 后，启动完成时在日志中输出各阶段耗时
+ENABLED = os.environ.get("TGC_STARTUP_TIMING") == "1"
+
+_origin = time.perf_counter()
+_phases = []  # [(名称, 相对 main.py 开始执行的偏移秒数, 耗时秒数, 线程名)]
+
+
+@contextmanager
+def phase(name):
+    """统计一个启动阶段的耗时 (未开启时几乎没有开销)"""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, start - _origin, time.perf_counter() - start, threading.current_thread().name))
+
+
+def mark(name):
+    """记录一个时间点，例如“登录窗口已显示”"""
+    if ENABLED:
+        _phases.append((name, time.perf_counter() - _origin, 0.0, threading.current_thread().name))
+
+
+def report():
+    """把启动耗时明细写入日志"""
+    if not ENABLED:
+        return
+    lines = ["⏱️ 启动耗时 (相对 main.py 开始执行):"]
+    for name, offset, duration, thread_name in sorted(_phases, key=lambda p: p[1]):
+        duration_text = f"{duration * 1000:8.1f} ms" if duration else " " * 11
+        thread_text = "" if thread_name == "MainThread" else f"  [{thread_name}]"
+        lines.append(f"  +{offset * 1000:8.1f} ms  {duration_text}  {name}{thread_text}")
+    logging.info("\n".join(lines))